@@ -1,22 +1,128 @@
+import asyncio
 import sqlite3
 import logging
+import re
+import threading
 from datetime import datetime, timedelta
 import json
 import os
 from config import DB_PATH, DEFAULT_WATER_GOAL
+from utils import TTLCache
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Укороченное название рецепта для кнопок, вычисляемое прямо в запросе
+_DISPLAY_NAME_SQL = (
+    "CASE WHEN length({col}) > {limit} THEN substr({col}, 1, {cut}) || '...' "
+    "ELSE {col} END AS display_name"
+)
+_RECIPE_DISPLAY_NAME = _DISPLAY_NAME_SQL.format(col="name", limit=30, cut=27)
+_PLAN_DISPLAY_NAME = _DISPLAY_NAME_SQL.format(col="r.name", limit=20, cut=20)
+
+# Столбцы, которых достаточно для кнопок в списках рецептов (без ингредиентов и инструкций)
+_RECIPE_LIST_COLUMNS = "id, name, calories, is_favorite, creation_date"
+
+# Кэш профилей пользователей: профиль читается почти в каждом обработчике, а меняется редко
+_user_cache = TTLCache(maxsize=4096, ttl=60)
+
+# Кэш списков рецептов по ключу (user_id, is_favorite); сбрасывается при любом изменении рецептов пользователя
+_saved_recipes_cache = TTLCache(maxsize=1024, ttl=60)
+
+# Кэш карточек рецептов по ID: одна и та же карточка перечитывается несколько раз за один сценарий
+_recipe_details_cache = TTLCache(maxsize=2048, ttl=60)
+
+
+class _PooledConnection(sqlite3.Connection):
+    """
+    Соединение, закрепленное за потоком и переиспользуемое между вызовами функций модуля.
+
+    close() не закрывает соединение, а только откатывает незавершенную транзакцию,
+    поэтому кэш подготовленных выражений sqlite3 сохраняется между запросами.
+    """
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def close_for_real(self):
+        super().close()
+
+
+# Полнотекстовый индекс рецептов (внешнее содержимое из таблицы recipes, синхронизация триггерами)
+_RECIPES_FTS_SQL = (
+    "CREATE VIRTUAL TABLE recipes_fts USING fts5("
+    "name, ingredients, instructions, content='recipes', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+_RECIPES_FTS_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS recipes_fts_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipes_fts(rowid, name, ingredients, instructions)
+        VALUES (new.id, new.name, new.ingredients, new.instructions);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS recipes_fts_ad AFTER DELETE ON recipes BEGIN
+        INSERT INTO recipes_fts(recipes_fts, rowid, name, ingredients, instructions)
+        VALUES ('delete', old.id, old.name, old.ingredients, old.instructions);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS recipes_fts_au AFTER UPDATE OF name, ingredients, instructions ON recipes BEGIN
+        INSERT INTO recipes_fts(recipes_fts, rowid, name, ingredients, instructions)
+        VALUES ('delete', old.id, old.name, old.ingredients, old.instructions);
+        INSERT INTO recipes_fts(rowid, name, ingredients, instructions)
+        VALUES (new.id, new.name, new.ingredients, new.instructions);
+    END''',
+)
+_recipes_fts_enabled = False
+
+# Слова поискового запроса для выражения MATCH
+_SEARCH_TOKEN_RE = re.compile(r'\w+')
+
+# Ограничение числа одновременных обращений к БД из db_call
+DB_CONCURRENCY = 8
+_db_semaphore = asyncio.Semaphore(DB_CONCURRENCY)
+
+# Соединения по потокам: у каждого потока (в том числе рабочих потоков db_call) свое соединение
+_local = threading.local()
+_pool = []
+_pool_lock = threading.Lock()
+_pool_generation = 0
+
+
+def _casefold(value):
+    """Приводит строку к нижнему регистру с учетом Unicode (для SQL-функции py_casefold)."""
+    return value.casefold() if isinstance(value, str) else value
+
 
 def get_db_connection():
-    """Создает соединение с базой данных."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Возвращает соединение с базой данных, закрепленное за текущим потоком."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _pool_generation:
+        conn = sqlite3.connect(DB_PATH, factory=_PooledConnection, cached_statements=256,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # В режиме WAL достаточно NORMAL: fsync выполняется на контрольных точках, а не при каждом commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # LOWER в SQLite приводит к нижнему регистру только ASCII, поэтому для кириллицы — Python
+        conn.create_function("py_casefold", 1, _casefold, deterministic=True)
+        _local.conn = conn
+        _local.generation = _pool_generation
+        with _pool_lock:
+            _pool.append(conn)
     return conn
 
 
+async def db_call(fn, *args, **kwargs):
+    """
+    Выполняет синхронную функцию работы с БД в отдельном потоке, не блокируя цикл событий.
+
+    Одновременно выполняется не больше DB_CONCURRENCY вызовов: при всплеске нажатий
+    остальные ждут в цикле событий, а не занимают все потоки общего пула asyncio.to_thread
+    и не плодят соединения (у каждого рабочего потока свое).
+    """
+    async with _db_semaphore:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+
 def init_nutritionists_table():
     """Создает таблицу диетологов и заполняет её тестовыми данными."""
     conn = get_db_connection()
@@ -855,6 +961,7 @@ def update_user_weight(user_id, new_weight):
         ''', (new_weight, user_id))
 
         conn.commit()
+        invalidate_user(user_id)
         logger.info(f"Обновлен вес в профиле пользователя {user_id}: {new_weight} кг")
         return True
 
@@ -958,13 +1065,13 @@ def remove_shopping_cart_item(user_id, item_id):
     """Удаляет продукт из корзины."""
     conn = get_db_connection()
     try:
-        conn.execute('''
+        cursor = conn.execute('''
             DELETE FROM shopping_cart 
             WHERE user_id = ? AND id = ?
         ''', (user_id, item_id))
 
         conn.commit()
-        return conn.total_changes > 0
+        return cursor.rowcount > 0
 
     except Exception as e:
         logger.error(f"Ошибка при удалении из корзины: {e}")
@@ -976,14 +1083,14 @@ def update_shopping_cart_item(user_id, item_id, quantity, unit):
     """Обновляет количество продукта в корзине."""
     conn = get_db_connection()
     try:
-        conn.execute('''
+        cursor = conn.execute('''
             UPDATE shopping_cart 
             SET quantity = ?, unit = ?
             WHERE user_id = ? AND id = ?
         ''', (quantity, unit, user_id, item_id))
 
         conn.commit()
-        return conn.total_changes > 0
+        return cursor.rowcount > 0
 
     except Exception as e:
         logger.error(f"Ошибка при обновлении корзины: {e}")
@@ -1007,14 +1114,14 @@ def toggle_item_purchased(user_id, item_id):
 
         new_status = not row['is_purchased']
 
-        conn.execute('''
+        cursor = conn.execute('''
             UPDATE shopping_cart 
             SET is_purchased = ?
             WHERE user_id = ? AND id = ?
         ''', (new_status, user_id, item_id))
 
         conn.commit()
-        return conn.total_changes > 0
+        return cursor.rowcount > 0
 
     except Exception as e:
         logger.error(f"Ошибка при изменении статуса покупки: {e}")
@@ -1041,11 +1148,38 @@ def clear_shopping_cart(user_id):
     finally:
         conn.close()
 
+def _init_recipes_fts(conn):
+    """
+    Создает полнотекстовый индекс recipes_fts и триггеры синхронизации с таблицей recipes.
+
+    Если SQLite собран без FTS5, поиск продолжает работать через LIKE.
+    """
+    global _recipes_fts_enabled
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'"
+        ).fetchone()
+        if not exists:
+            conn.execute(_RECIPES_FTS_SQL)
+            # Однократно заполняем индекс уже сохраненными рецептами
+            conn.execute("INSERT INTO recipes_fts(recipes_fts) VALUES ('rebuild')")
+            logger.info("Создан полнотекстовый индекс рецептов recipes_fts")
+        for trigger in _RECIPES_FTS_TRIGGERS:
+            conn.execute(trigger)
+        _recipes_fts_enabled = True
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 недоступен, поиск рецептов будет использовать LIKE: {e}")
+        _recipes_fts_enabled = False
+
+
 def init_db():
     """Инициализирует базу данных, создавая необходимые таблицы."""
     conn = get_db_connection()
 
     try:
+        # WAL сохраняется в файле базы: читатели не блокируют запись, а commit не требует fsync основного файла
+        conn.execute("PRAGMA journal_mode=WAL")
+
         # Таблица пользователей
         conn.execute(f'''
         CREATE TABLE IF NOT EXISTS users (
@@ -1109,6 +1243,7 @@ def init_db():
                     fat REAL,
                     carbs REAL,
                     photo_path TEXT,
+                    ingredients_json TEXT,
                     creation_date TEXT DEFAULT CURRENT_TIMESTAMP,
                     is_favorite BOOLEAN DEFAULT 0,
                     FOREIGN KEY (user_id) REFERENCES users (id)
@@ -1144,8 +1279,19 @@ def init_db():
         conn.execute('CREATE INDEX IF NOT EXISTS idx_food_entries_user_date ON food_entries (user_id, date)')
         conn.execute('CREATE INDEX IF NOT EXISTS idx_water_entries_user_date ON water_entries (user_id, date)')
         conn.execute('CREATE INDEX IF NOT EXISTS idx_recipes_user ON recipes (user_id)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_meal_plan_user_date ON meal_plan (user_id, date)')
+        # Выборка и подсчет избранного: фильтр по (user_id, is_favorite), сортировка по дате из индекса
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_recipes_user_fav ON recipes (user_id, is_favorite, creation_date)'
+        )
+        # Составной индекс покрывает и выборку плана на день (префикс user_id, date),
+        # поэтому прежний индекс (user_id, date) больше не нужен
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_meal_plan_user_date_type_recipe '
+            'ON meal_plan (user_id, date, meal_type, recipe_id)'
+        )
+        conn.execute('DROP INDEX IF EXISTS idx_meal_plan_user_date')
 
+        _init_recipes_fts(conn)
 
 
         cursor = conn.execute("PRAGMA table_info(users)")
@@ -1160,6 +1306,12 @@ def init_db():
             conn.commit()
             logger.info("Столбец photo_path успешно добавлен в таблицу recipes.")
 
+        if "ingredients_json" not in columns:
+            # Для старых рецептов столбец остается пустым, и список получается из ingredients
+            conn.execute("ALTER TABLE recipes ADD COLUMN ingredients_json TEXT")
+            conn.commit()
+            logger.info("Столбец ingredients_json успешно добавлен в таблицу recipes.")
+
         conn.commit()
         logger.info("База данных успешно инициализирована")
     except Exception as e:
@@ -1231,6 +1383,7 @@ def create_user(user_id, name=None):
                 (user_id, name, DEFAULT_WATER_GOAL)
             )
             conn.commit()
+            invalidate_user(user_id)
             logger.info(f"Создан новый пользователь с ID: {user_id}")
             return True
         else:
@@ -1244,11 +1397,17 @@ def create_user(user_id, name=None):
 
 
 def get_user(user_id):
-    """Получает данные пользователя."""
+    """Получает данные пользователя (с кэшированием на время жизни _user_cache)."""
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        return dict(cached)
+
     conn = get_db_connection()
     try:
         user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
         if user:
+            user = dict(user)
+            _user_cache.set(user_id, user)
             return dict(user)
         return None
     except Exception as e:
@@ -1257,11 +1416,10 @@ def get_user(user_id):
     finally:
         conn.close()
 
-    logging.info(f"Вызов get_user с ID: {user_id}")
-    query = "SELECT * FROM users WHERE id = ?"
-    result = execute_query(query, (user_id,), fetchone=True)
-    logging.info(f"Результат get_user: {result}")
-    return result
+
+def invalidate_user(user_id):
+    """Сбрасывает кэшированный профиль пользователя после изменения таблицы users."""
+    _user_cache.pop(user_id)
 
 
 def update_user(user_id, **kwargs):
@@ -1285,6 +1443,7 @@ def update_user(user_id, **kwargs):
         query = f"UPDATE users SET {', '.join(fields)} WHERE id = ?"
         conn.execute(query, values)
         conn.commit()
+        invalidate_user(user_id)
 
         logger.info(f"Обновлены данные пользователя {user_id}")
         return True
@@ -1301,15 +1460,15 @@ def add_food_entry(user_id, date, meal_type, food_name, calories, protein, fat,
     """Добавляет запись о еде в дневник."""
     conn = get_db_connection()
     try:
-        conn.execute(
+        entry_id = conn.execute(
             '''INSERT INTO food_entries 
             (user_id, date, meal_type, food_name, calories, protein, fat, carbs) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?) RETURNING id''',
             (user_id, date, meal_type, food_name, calories, protein, fat, carbs)
-        )
+        ).fetchone()[0]
         conn.commit()
         logger.info(f"Добавлена запись о еде для пользователя {user_id}")
-        return conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        return entry_id
     except Exception as e:
         logger.error(f"Ошибка при добавлении записи о еде: {e}")
         return None
@@ -1317,6 +1476,31 @@ def add_food_entry(user_id, date, meal_type, food_name, calories, protein, fat,
         conn.close()
 
 
+def add_food_entries_bulk(rows):
+    """Добавляет несколько записей о еде одной транзакцией.
+
+    rows — последовательность кортежей
+    (user_id, date, meal_type, food_name, calories, protein, fat, carbs).
+    """
+    conn = get_db_connection()
+    try:
+        rows = list(rows)
+        with conn:
+            conn.executemany(
+                '''INSERT INTO food_entries 
+                (user_id, date, meal_type, food_name, calories, protein, fat, carbs) 
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                rows
+            )
+        logger.info(f"Добавлено записей о еде: {len(rows)}")
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Ошибка при пакетном добавлении записей о еде: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
 def get_daily_entries(user_id, date):
     """Получает все записи о еде за день."""
     conn = get_db_connection()
@@ -1484,6 +1668,7 @@ def set_water_goal(user_id, goal):
             (goal, user_id)
         )
         conn.commit()
+        invalidate_user(user_id)
         logger.info(f"Установлена новая цель по воде ({goal} мл) для пользователя {user_id}")
         return True
     except Exception as e:
@@ -1523,18 +1708,33 @@ def get_weekly_water(user_id, end_date=None):
 # Функции для работы с рецептами
 #Сохраняет новый рецепт
 
+def _ingredients_json(ingredients):
+    """
+    Разбивает текст ингредиентов на список и кодирует его в JSON для столбца ingredients_json.
+
+    Если ингредиенты введены построчно, разделителем служит перевод строки
+    (запятые внутри строки сохраняются), иначе — запятая.
+    """
+    separator = "\n" if "\n" in ingredients else ","
+    items = [item.strip() for item in ingredients.split(separator)]
+    return json.dumps([item for item in items if item], ensure_ascii=False)
+
+
 def save_recipe(user_id, name, ingredients, instructions, calories, protein, fat, carbs, photo_path=None):
     conn = get_db_connection()
     try:
-        conn.execute(
+        # Новая строка целиком возвращается той же инструкцией, до commit
+        recipe = dict(conn.execute(
             '''INSERT INTO recipes 
-            (user_id, name, ingredients, instructions, calories, protein, fat, carbs, photo_path) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-            (user_id, name, ingredients, instructions, calories, protein, fat, carbs, photo_path)
-        )
+            (user_id, name, ingredients, ingredients_json, instructions, calories, protein, fat, carbs, photo_path) 
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) RETURNING *''',
+            (user_id, name, ingredients, _ingredients_json(ingredients), instructions,
+             calories, protein, fat, carbs, photo_path)
+        ).fetchone())
         conn.commit()
-        #return True
-        recipe_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        recipe_id = recipe['id']
+        _recipe_details_cache.set(recipe_id, recipe)
+        invalidate_saved_recipes(user_id)
 
         logger.info(f"Сохранен новый рецепт {name} для пользователя {user_id}")
         return recipe_id
@@ -1545,11 +1745,67 @@ def save_recipe(user_id, name, ingredients, instructions, calories, protein, fat
         conn.close()
 
 
+def save_recipes_bulk(user_id, recipes, page_size=100):
+    """Сохраняет несколько рецептов одной транзакцией.
+
+    Рецепты вставляются многострочными INSERT ... RETURNING id по page_size строк,
+    поэтому на каждую страницу приходится один запрос. Возвращает список ID
+    новых рецептов (пустой список при ошибке).
+    """
+    conn = get_db_connection()
+    try:
+        rows = [
+            (user_id, r["name"], r["ingredients"], _ingredients_json(r["ingredients"]), r["instructions"],
+             r["calories"], r["protein"], r["fat"], r["carbs"])
+            for r in recipes
+        ]
+        recipe_ids = []
+        with conn:
+            for start in range(0, len(rows), page_size):
+                page = rows[start:start + page_size]
+                placeholders = ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?, ?)"] * len(page))
+                cursor = conn.execute(
+                    f'''INSERT INTO recipes 
+                    (user_id, name, ingredients, ingredients_json, instructions, calories, protein, fat, carbs) 
+                    VALUES {placeholders}
+                    RETURNING id''',
+                    [value for row in page for value in row]
+                )
+                recipe_ids.extend(row[0] for row in cursor.fetchall())
+        invalidate_saved_recipes(user_id)
+        logger.info(f"Сохранено {len(recipe_ids)} рецептов для пользователя {user_id}")
+        return recipe_ids
+    except Exception as e:
+        logger.error(f"Ошибка при пакетном сохранении рецептов: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def invalidate_saved_recipes(user_id):
+    """Сбрасывает кэшированные списки рецептов пользователя."""
+    for is_favorite in (None, True, False):
+        _saved_recipes_cache.pop((user_id, is_favorite))
+
+
+def _get_recipe_owner(conn, recipe_id):
+    """Возвращает ID владельца рецепта или None."""
+    row = conn.execute('SELECT user_id FROM recipes WHERE id = ?', (recipe_id,)).fetchone()
+    return row['user_id'] if row else None
+
+
 def get_saved_recipes(user_id, is_favorite=None):
-    #Получает список сохраненных рецептов
+    #Получает список сохраненных рецептов (кортеж: результат кэшируется и общий для всех вызовов)
+    if is_favorite is not None:
+        is_favorite = bool(is_favorite)
+    cache_key = (user_id, is_favorite)
+    cached = _saved_recipes_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     conn = get_db_connection()
     try:
-        query = 'SELECT * FROM recipes WHERE user_id = ?'
+        query = f'SELECT *, {_RECIPE_DISPLAY_NAME} FROM recipes WHERE user_id = ?'
         params = [user_id]
 
         if is_favorite is not None:
@@ -1558,10 +1814,64 @@ def get_saved_recipes(user_id, is_favorite=None):
 
         query += ' ORDER BY is_favorite DESC, creation_date DESC'
 
+        recipes = tuple(dict(recipe) for recipe in conn.execute(query, params).fetchall())
+        _saved_recipes_cache.set(cache_key, recipes)
+        return recipes
+    except Exception as e:
+        logger.error(f"Ошибка при получении списка рецептов: {e}")
+        return ()
+    finally:
+        conn.close()
+
+
+def get_saved_recipes_summary(user_id, is_favorite=None):
+    """Получает список рецептов пользователя только со столбцами для кнопок списка."""
+    conn = get_db_connection()
+    try:
+        query = f'SELECT {_RECIPE_LIST_COLUMNS}, {_RECIPE_DISPLAY_NAME} FROM recipes WHERE user_id = ?'
+        params = [user_id]
+
+        if is_favorite is not None:
+            query += ' AND is_favorite = ?'
+            params.append(int(bool(is_favorite)))
+
+        query += ' ORDER BY is_favorite DESC, creation_date DESC, id DESC'
+
+        return [dict(recipe) for recipe in conn.execute(query, params).fetchall()]
+    except Exception as e:
+        logger.error(f"Ошибка при получении списка рецептов: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def get_saved_recipes_page(user_id, offset=0, limit=20, is_favorite=None):
+    """
+    Получает одну страницу сохраненных (или только избранных) рецептов пользователя.
+
+    Выбираются только столбцы для списков (_RECIPE_LIST_COLUMNS) и display_name;
+    в каждой строке есть total_count — общее количество рецептов с тем же фильтром.
+    """
+    conn = get_db_connection()
+    try:
+        # total_count — число всех подходящих рецептов, считается тем же запросом оконной функцией
+        query = (
+            f'SELECT {_RECIPE_LIST_COLUMNS}, {_RECIPE_DISPLAY_NAME}, COUNT(*) OVER () AS total_count '
+            'FROM recipes WHERE user_id = ?'
+        )
+        params = [user_id]
+
+        if is_favorite is not None:
+            query += ' AND is_favorite = ?'
+            params.append(int(bool(is_favorite)))
+
+        query += ' ORDER BY is_favorite DESC, creation_date DESC, id DESC LIMIT ? OFFSET ?'
+        params.extend((limit, offset))
+
         recipes = conn.execute(query, params).fetchall()
         return [dict(recipe) for recipe in recipes]
     except Exception as e:
-        logger.error(f"Ошибка при получении списка рецептов: {e}")
+        logger.error(f"Ошибка при получении страницы рецептов: {e}")
         return []
     finally:
         conn.close()
@@ -1569,11 +1879,17 @@ def get_saved_recipes(user_id, is_favorite=None):
 
 def get_recipe_details(recipe_id):
     #Получает подробную информацию о рецепте
+    cached = _recipe_details_cache.get(recipe_id)
+    if cached is not None:
+        return dict(cached)
+
     conn = get_db_connection()
     try:
         recipe = conn.execute('SELECT * FROM recipes WHERE id = ?', (recipe_id,)).fetchone()
 
         if recipe:
+            recipe = dict(recipe)
+            _recipe_details_cache.set(recipe_id, recipe)
             return dict(recipe)
         return None
     except Exception as e:
@@ -1583,31 +1899,65 @@ def get_recipe_details(recipe_id):
         conn.close()
 
 
+def get_recipes_by_ids(recipe_ids):
+    """Получает рецепты по списку ID одним запросом. Возвращает словарь {id: рецепт}."""
+    recipe_ids = list(set(recipe_ids))
+    if not recipe_ids:
+        return {}
+
+    conn = get_db_connection()
+    try:
+        placeholders = ", ".join("?" * len(recipe_ids))
+        rows = conn.execute(
+            f'SELECT * FROM recipes WHERE id IN ({placeholders})',
+            recipe_ids
+        ).fetchall()
+        return {row['id']: dict(row) for row in rows}
+    except Exception as e:
+        logger.error(f"Ошибка при получении рецептов по списку ID: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def prefetch_recipe_details(recipe_ids):
+    """
+    Загружает в кэш карточек рецепты, которых там еще нет, одним запросом WHERE id IN (...).
+
+    Вызывается для рецептов видимой страницы списка, чтобы открытие любой карточки
+    обслуживалось get_recipe_details из кэша. Возвращает количество загруженных рецептов.
+    """
+    missing = [recipe_id for recipe_id in recipe_ids if _recipe_details_cache.get(recipe_id) is None]
+    recipes = get_recipes_by_ids(missing)
+    for recipe_id, recipe in recipes.items():
+        _recipe_details_cache.set(recipe_id, recipe)
+    return len(recipes)
+
+
 def toggle_favorite_recipe(recipe_id):
-    #Изменяет статус избранного для рецепта
+    #Изменяет статус избранного для рецепта и возвращает обновленный рецепт (None, если рецепт не найден)
     conn = get_db_connection()
     try:
-        # Получаем текущий статус
-        current = conn.execute(
-            'SELECT is_favorite FROM recipes WHERE id = ?',
+        # Инвертируем статус и сразу получаем обновленную строку, без отдельных SELECT
+        rows = conn.execute(
+            'UPDATE recipes SET is_favorite = 1 - COALESCE(is_favorite, 0) WHERE id = ? RETURNING *',
             (recipe_id,)
-        ).fetchone()
+        ).fetchall()
+        conn.commit()
 
-        if current:
-            new_status = 1 - current['is_favorite']  # Инвертируем статус
+        if not rows:
+            return None
 
-            conn.execute(
-                'UPDATE recipes SET is_favorite = ? WHERE id = ?',
-                (new_status, recipe_id)
-            )
-            conn.commit()
-            logger.info(f"Изменен статус избранного для рецепта {recipe_id} на {new_status}")
+        recipe = dict(rows[0])
+        # Кэш карточки сразу получает обновленную строку, чтобы повторный показ не шел в БД
+        _recipe_details_cache.set(recipe_id, dict(recipe))
+        invalidate_saved_recipes(recipe['user_id'])
+        logger.info(f"Изменен статус избранного для рецепта {recipe_id} на {recipe['is_favorite']}")
 
-            return bool(new_status)
-        return False
+        return recipe
     except Exception as e:
         logger.error(f"Ошибка при изменении статуса избранного: {e}")
-        return False
+        return None
     finally:
         conn.close()
 
@@ -1616,6 +1966,8 @@ def delete_recipe(recipe_id):
     #Удаляет рецепт
     conn = get_db_connection()
     try:
+        owner_id = _get_recipe_owner(conn, recipe_id)
+
         # Сначала удаляем все ссылки на этот рецепт из плана питания
         conn.execute('DELETE FROM meal_plan WHERE recipe_id = ?', (recipe_id,))
 
@@ -1623,6 +1975,8 @@ def delete_recipe(recipe_id):
         conn.execute('DELETE FROM recipes WHERE id = ?', (recipe_id,))
 
         conn.commit()
+        _recipe_details_cache.pop(recipe_id)
+        invalidate_saved_recipes(owner_id)
         logger.info(f"Удален рецепт {recipe_id}")
         return True
     except Exception as e:
@@ -1655,7 +2009,7 @@ def get_daily_meal_plan(user_id, date):
     conn = get_db_connection()
     try:
         result = conn.execute(
-            '''SELECT mp.id, mp.meal_type, r.name, r.calories, r.protein, r.fat, r.carbs 
+            '''SELECT mp.id, mp.meal_type, mp.recipe_id, r.name, r.calories, r.protein, r.fat, r.carbs 
             FROM meal_plan mp 
             JOIN recipes r ON mp.recipe_id = r.id 
             WHERE mp.user_id = ? AND mp.date = ? 
@@ -1683,7 +2037,8 @@ def get_meal_plan_for_type(user_id, meal_type, date):
     conn = get_db_connection()
     try:
         result = conn.execute(
-            '''SELECT mp.id, mp.meal_type, r.id as recipe_id, r.name, r.calories, r.protein, r.fat, r.carbs 
+            f'''SELECT mp.id, mp.meal_type, r.id as recipe_id, r.name, r.calories, r.protein, r.fat, r.carbs,
+                {_PLAN_DISPLAY_NAME}
             FROM meal_plan mp 
             JOIN recipes r ON mp.recipe_id = r.id 
             WHERE mp.user_id = ? AND mp.date = ? AND mp.meal_type = ?''',
@@ -1698,6 +2053,24 @@ def get_meal_plan_for_type(user_id, meal_type, date):
         conn.close()
 
 
+def find_meal_plan_entry(user_id, date, meal_type, recipe_id):
+    """Находит ID записи плана питания с указанным рецептом в приеме пищи. Возвращает None, если записи нет."""
+    conn = get_db_connection()
+    try:
+        row = conn.execute(
+            '''SELECT id FROM meal_plan
+            WHERE user_id = ? AND date = ? AND meal_type = ? AND recipe_id = ?
+            LIMIT 1''',
+            (user_id, date, meal_type, recipe_id)
+        ).fetchone()
+        return row['id'] if row else None
+    except Exception as e:
+        logger.error(f"Ошибка при поиске записи в плане питания: {e}")
+        return None
+    finally:
+        conn.close()
+
+
 def remove_from_meal_plan(plan_id):
     """Удаляет запись из плана питания."""
     conn = get_db_connection()
@@ -1730,6 +2103,30 @@ def clear_meal_plan(user_id, date):
     finally:
         conn.close()
 
+def replace_daily_plan(user_id, date, entries):
+    """Заменяет план питания на день одной транзакцией.
+
+    entries — список пар (recipe_id, meal_type).
+    """
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.execute(
+                'DELETE FROM meal_plan WHERE user_id = ? AND date = ?',
+                (user_id, date)
+            )
+            conn.executemany(
+                'INSERT INTO meal_plan (user_id, recipe_id, meal_type, date) VALUES (?, ?, ?, ?)',
+                [(user_id, recipe_id, meal_type, date) for recipe_id, meal_type in entries]
+            )
+        logger.info(f"Обновлен план питания пользователя {user_id} за {date}: {len(entries)} блюд")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при замене плана питания: {e}")
+        return False
+    finally:
+        conn.close()
+
 def check_db_structure():
     conn = get_db_connection()
     try:
@@ -1740,30 +2137,59 @@ def check_db_structure():
         conn.close()
 
 
-def search_recipes(user_id, search_query):
-    """Поиск рецептов по названию и ингредиентам"""
-    conn = get_db_connection()
-    try:
-        # Подготавливаем поисковый запрос
-        search_query = f"%{search_query.strip().lower()}%"
-
-        query = """
-        SELECT * FROM recipes 
-        WHERE user_id = ? 
-        AND (LOWER(name) LIKE ? OR LOWER(ingredients) LIKE ?)
-        ORDER BY 
-            CASE 
-                WHEN LOWER(name) LIKE ? THEN 1  
-                ELSE 2 
-            END,
-            is_favorite DESC,
-            creation_date DESC
-        LIMIT 20
+def _build_match_query(search_query):
+    """Превращает поисковую строку в префиксный запрос FTS5 вида {name ingredients}: "сыр"* "томат"*."""
+    tokens = _SEARCH_TOKEN_RE.findall(search_query)
+    if not tokens:
+        return None
+    return "{name ingredients}: " + " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_recipes_page(user_id, search_query, cursor=None, limit=6):
+    """
+    Возвращает страницу результатов поиска с keyset-пагинацией.
+
+    Строки упорядочены по паре (score, id): для FTS5 score — релевантность bm25,
+    для LIKE — 1 при совпадении в названии и 2 при совпадении только в ингредиентах.
+    Следующая страница запрашивается с cursor = [score, id] последней показанной строки.
+
+    Args:
+        user_id (int): ID пользователя
+        search_query (str): Поисковый запрос
+        cursor (list, optional): [score, id] последней строки предыдущей страницы
+        limit (int): Максимальное количество строк
+
+    Returns:
+        list: Рецепты (id, name, calories, score)
+    """
+    match_query = _build_match_query(search_query) if _recipes_fts_enabled else None
+    if match_query is not None:
+        inner = """
+            SELECT r.id, r.name, r.calories, bm25(recipes_fts, 10.0, 1.0, 0.0) AS score
+            FROM recipes_fts f JOIN recipes r ON r.id = f.rowid
+            WHERE recipes_fts MATCH ? AND r.user_id = ?
+        """
+        params = [match_query, user_id]
+    else:
+        # Регистр сравнивается через py_casefold: LOWER не переводит кириллицу в нижний регистр
+        pattern = f"%{search_query.strip().casefold()}%"
+        inner = """
+            SELECT id, name, calories, CASE WHEN py_casefold(name) LIKE ? THEN 1 ELSE 2 END AS score
+            FROM recipes
+            WHERE user_id = ? AND (py_casefold(name) LIKE ? OR py_casefold(ingredients) LIKE ?)
         """
+        params = [pattern, user_id, pattern, pattern]
 
-        recipes = conn.execute(query, (user_id, search_query, search_query, search_query)).fetchall()
-        logger.info(f"Found {len(recipes)} recipes for query: {search_query}")
-        return [dict(recipe) for recipe in recipes]
+    query = f"SELECT * FROM ({inner})"
+    if cursor is not None:
+        query += " WHERE (score, id) > (?, ?)"
+        params.extend(cursor)
+    query += " ORDER BY score, id LIMIT ?"
+    params.append(limit)
+
+    conn = get_db_connection()
+    try:
+        return [dict(recipe) for recipe in conn.execute(query, params).fetchall()]
     except Exception as e:
         logger.error(f"Ошибка при поиске рецептов: {e}", exc_info=True)
         return []
@@ -1771,7 +2197,16 @@ def search_recipes(user_id, search_query):
         conn.close()
 
 
-
 def close_db():
-    """Закрывает соединение с базой данных."""
-    pass  # Здесь ничего не нужно делать, т.к. мы создаем и закрываем соединение в каждой функции
\ No newline at end of file
+    """Закрывает все соединения с базой данных из пула потоков."""
+    global _pool_generation
+    with _pool_lock:
+        connections = _pool[:]
+        _pool.clear()
+        _pool_generation += 1
+
+    for conn in connections:
+        try:
+            conn.close_for_real()
+        except Exception as e:
+            logger.error(f"Ошибка при закрытии соединения с БД: {e}")
\ No newline at end of file
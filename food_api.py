@@ -11,6 +11,7 @@
 2. Запросы к Nutritionix API:
    - Универсальная функция make_request для отправки GET и POST-запросов.
    - Поддержка авторизации через заголовки с API-ключами.
+   - Общая HTTP-сессия get_session() с пулом keep-alive соединений.
 
 3. Основные функции:
    - search_food(query): поиск продуктов по названию (обычные и брендированные).
@@ -23,6 +24,7 @@
 
 
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 from config import NUTRITIONIX_APP_ID, NUTRITIONIX_API_KEY
 from deep_translator import GoogleTranslator
@@ -59,6 +61,22 @@ def get_headers():
     }
 
 
+# Общая HTTP-сессия: соединения с Nutritionix (TCP + TLS) переиспользуются между запросами
+_session = None
+
+
+def get_session():
+    """Возвращает общую HTTP-сессию с пулом keep-alive соединений, создавая ее при первом вызове."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=100)
+        session.mount('https://', adapter)
+        session.headers.update(get_headers())
+        _session = session
+    return _session
+
+
 def make_request(method, endpoint, **kwargs):
     """Упрощенная функция для выполнения GET или POST запроса."""
     url = f"{BASE_URL}{endpoint}"
@@ -69,9 +87,9 @@ def make_request(method, endpoint, **kwargs):
 
     try:
         if method == 'GET':
-            response = requests.get(url, headers=get_headers(), **kwargs)
+            response = get_session().get(url, timeout=10, **kwargs)
         elif method == 'POST':
-            response = requests.post(url, headers=get_headers(), **kwargs)
+            response = get_session().post(url, timeout=10, **kwargs)
         else:
             logger.error(f"Неподдерживаемый метод запроса: {method}")
             return None
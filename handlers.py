@@ -32,20 +32,18 @@ from meal_planner import (
     delete_plan_entry, clear_plan, confirm_clear_plan, cancel_clear_plan,
     transfer_plan_to_diary, generate_meal_plan, return_to_plan_view,
     handle_meal_plan_menu, handle_replace_dish, confirm_replace_dish,
-    generate_daily_meal_plan, generate_weekly_meal_plan
+    generate_daily_meal_plan, generate_weekly_meal_plan, handle_plan_recipes_page
 )
 from recipe_generator import (
-    show_recipes_menu, handle_recipes_callback, view_recipe_details,
-    toggle_recipe_favorite_status, delete_recipe_handler,
-    return_to_recipes_menu, start_recipe_creation, process_recipe_name,
+    show_recipes_menu,
+    return_to_recipes_menu, process_recipe_name,
     process_recipe_ingredients, process_recipe_instructions,
     process_recipe_calories, process_recipe_protein,
-    process_recipe_fat, process_recipe_carbs, save_recipe_handler,
-    cancel_recipe_creation, generate_recipe, recipe_to_diary, process_search_query, show_search_results,
-    handle_search_page,
-    toggle_favorite_handler, add_to_menu_handler, show_favorites,
-    show_favorites_page,
-    view_favorite_recipe, RecipeStates
+    process_recipe_fat, process_recipe_carbs,
+    process_search_query, show_search_results,
+    show_favorites_page, RecipeStates,
+    handle_recipe_callback, RECIPE_CALLBACK_RE,
+    handle_recipe_menu_callback, RECIPE_MENU_CALLBACKS
 )
 from visualizer import (
     show_statistics, handle_statistics_callback,
@@ -102,19 +100,14 @@ def register_handlers(dp):
     @router.callback_query(F.data == "back_to_favorites")
     async def back_to_favorites_handler(callback_query: CallbackQuery, state: FSMContext):
         """Возвращает к списку избранных рецептов."""
-        await show_favorites_page(callback_query, state)
+        data = await state.get_data()
+        await show_favorites_page(callback_query, state, data.get('current_fav_page', 0))
 
-    router.callback_query.register(save_recipe_handler, F.data == "recipe:save")
-    router.callback_query.register(cancel_recipe_creation, F.data == "recipe:cancel")
-
-    router.callback_query.register(handle_recipes_callback, F.data.startswith("recipe:"))
+    # Кнопки меню рецептов "recipe:действие" разбираются одним обработчиком по таблице
+    router.callback_query.register(handle_recipe_menu_callback, F.data.in_(RECIPE_MENU_CALLBACKS))
     router.message.register(process_search_query, StateFilter(RecipeStates.searching))
-    router.callback_query.register(handle_search_page, F.data.startswith("search_page:"))
-    router.callback_query.register(view_recipe_details, F.data.startswith("view_recipe:"))
-    router.callback_query.register(toggle_favorite_handler, F.data.startswith("toggle_fav:"))
-    router.callback_query.register(add_to_menu_handler, F.data.startswith("add_to_menu:"))
-    router.callback_query.register(show_favorites_page, F.data.startswith("fav_page:"))
-    router.callback_query.register(view_favorite_recipe, F.data.startswith("view_fav_recipe:"))
+    # Кнопки рецептов вида "действие:id" разбираются одним обработчиком по таблице
+    router.callback_query.register(handle_recipe_callback, F.data.regexp(RECIPE_CALLBACK_RE))
     router.callback_query.register(back_to_favorites_handler, F.data == "back_to_favorites")
     router.message.register(process_recipe_name, StateFilter(RecipeStates.entering_name))
     router.message.register(process_recipe_ingredients, StateFilter(RecipeStates.entering_ingredients))
@@ -177,7 +170,7 @@ def register_handlers(dp):
         """Возвращает к результатам поиска"""
         try:
             data = await state.get_data()
-            if 'search_results' in data:
+            if 'search_query' in data:
                 from recipe_generator import show_search_results  # Добавляем импорт
                 await show_search_results(callback_query, state, data.get('current_page', 0))
             else:
@@ -274,19 +267,20 @@ def register_handlers(dp):
         await callback_query.answer()
 
     router.callback_query.register(handle_plan_date_selection, F.data.startswith("plan_date:"))
-    router.callback_query.register(start_add_to_plan, F.data == "plan:add")
+    router.callback_query.register(start_add_to_plan, F.data.startswith("plan:add"))
     router.callback_query.register(handle_meal_type_selection,
                                    F.data.startswith("meal_type:") & ~StateFilter(DiaryStates))
     router.callback_query.register(handle_recipe_selection, F.data.startswith("plan_recipe:"))
-    router.callback_query.register(view_meal_type_plan, F.data.startswith("plan:") & F.data.contains(":") & ~F.data.in_(
-        ["plan:add", "plan:generate", "plan:to_diary", "plan:clear", "plan:back"]))
+    router.callback_query.register(handle_plan_recipes_page, F.data.startswith("plan_recipes_page:"))
+    router.callback_query.register(view_meal_type_plan, F.data.startswith("plan:") & ~F.data.startswith(
+        ("plan:add", "plan:generate", "plan:to_diary", "plan:clear", "plan:back")))
     router.callback_query.register(delete_plan_entry, F.data.startswith("delete_plan_entry:"))
-    router.callback_query.register(clear_plan, F.data == "plan:clear")
+    router.callback_query.register(clear_plan, F.data.startswith("plan:clear"))
     router.callback_query.register(confirm_clear_plan, F.data.startswith("confirm_clear_plan:"))
-    router.callback_query.register(cancel_clear_plan, F.data == "cancel_clear_plan")
-    router.callback_query.register(transfer_plan_to_diary, F.data == "plan:to_diary")
-    router.callback_query.register(generate_meal_plan, F.data == "plan:generate")
-    router.callback_query.register(return_to_plan_view, F.data == "return_to_plan_view")
+    router.callback_query.register(cancel_clear_plan, F.data.startswith("cancel_clear_plan"))
+    router.callback_query.register(transfer_plan_to_diary, F.data.startswith("plan:to_diary"))
+    router.callback_query.register(generate_meal_plan, F.data.startswith("plan:generate"))
+    router.callback_query.register(return_to_plan_view, F.data.startswith("return_to_plan_view"))
 
     # Обработчики для рациона - дополнительные
     router.callback_query.register(handle_replace_dish, F.data.startswith("replace_dish:"))
@@ -297,12 +291,9 @@ def register_handlers(dp):
     router.callback_query.register(save_whole_plan_to_diary, F.data.startswith("save_plan_to_diary:"))
     router.callback_query.register(handle_save_plan_to_diary, F.data.startswith("save_plan_to_diary:"))
     router.callback_query.register(show_plan_for_date, F.data.startswith("show_plan:"))
-    router.callback_query.register(transfer_plan_to_diary, F.data == "plan:to_diary")
+    router.callback_query.register(transfer_plan_to_diary, F.data.startswith("plan:to_diary"))
 
-    router.callback_query.register(toggle_recipe_favorite_status, F.data.startswith("toggle_favorite:"))
-    router.callback_query.register(delete_recipe_handler, F.data.startswith("delete_recipe:"))
     router.callback_query.register(return_to_recipes_menu, F.data == "return_to_recipes")
-    router.callback_query.register(recipe_to_diary, F.data.startswith("recipe_to_diary:"))
 
     router.callback_query.register(handle_statistics_callback, F.data.startswith("stats:"))
 
@@ -80,17 +80,24 @@ def create_date_selection_keyboard(current_date_str):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def create_meal_types_keyboard():
-    """Создает клавиатуру для выбора типа приема пищи."""
+def create_meal_types_keyboard(date=None):
+    """Создает клавиатуру для выбора типа приема пищи.
+
+    Если передана дата (выбор для плана питания), она добавляется в callback_data
+    кнопок: "meal_type:<прием>:<дата>".
+    """
     keyboard = []
+    suffix = f":{date}" if date else ""
 
     # Создаем по 2 кнопки в ряд
     for i in range(0, len(MEAL_TYPES), 2):
         row = []
-        row.append(InlineKeyboardButton(text=MEAL_TYPES[i], callback_data=f"meal_type:{MEAL_TYPES[i]}"))
+        row.append(InlineKeyboardButton(text=MEAL_TYPES[i], callback_data=f"meal_type:{MEAL_TYPES[i]}{suffix}"))
 
         if i + 1 < len(MEAL_TYPES):
-            row.append(InlineKeyboardButton(text=MEAL_TYPES[i + 1], callback_data=f"meal_type:{MEAL_TYPES[i + 1]}"))
+            row.append(InlineKeyboardButton(
+                text=MEAL_TYPES[i + 1], callback_data=f"meal_type:{MEAL_TYPES[i + 1]}{suffix}"
+            ))
 
         keyboard.append(row)
 
@@ -6,7 +6,7 @@ import asyncio
 import threading
 
 # Импорт модулей бота
-from run_bot import start_bot
+from run_bot import start_bot, install_event_loop_policy
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -51,6 +51,7 @@ if __name__ == "__main__":
     logger.info("Flask приложение запущено на порту 5000")
 
     # Запускаем бота в основном потоке
+    install_event_loop_policy()
     try:
         asyncio.run(start_bot())
     except KeyboardInterrupt:
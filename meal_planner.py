@@ -23,27 +23,145 @@ meal_planner.py
 
 import logging
 import asyncio
+import bisect
 import random
+from contextlib import suppress
 from datetime import datetime, timedelta
 from aiogram import types
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery
 
 from database import (
-    get_user, get_daily_meal_plan, get_saved_recipes,
+    get_user, get_daily_meal_plan, get_saved_recipes, get_saved_recipes_page,
     add_to_meal_plan, remove_from_meal_plan, clear_meal_plan,
-    get_meal_plan_for_type, get_recipe_details, toggle_favorite_recipe,
-    add_food_entry
+    get_meal_plan_for_type, find_meal_plan_entry, get_recipe_details,
+    save_recipes_bulk, replace_daily_plan, add_food_entries_bulk, db_call
 )
-from keyboards import create_date_selection_keyboard, create_meal_types_keyboard
-from utils import format_date
+from keyboards import create_date_selection_keyboard, create_meal_types_keyboard, after_calories_keyboard
+from utils import format_date, today_str, TTLCache
 from config import MEAL_TYPES
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Демонстрационные рецепты для пользователей, у которых мало своих рецептов
+_DEMO_RECIPES = (
+    {
+        "name": "Овсяная каша с ягодами",
+        "ingredients": "Овсяные хлопья 50г, Молоко 200мл, Ягоды 100г, Мед 1 ч.л.",
+        "instructions": "Сварить овсянку на молоке, добавить ягоды и мед",
+        "calories": 280,
+        "protein": 12,
+        "fat": 6,
+        "carbs": 45
+    },
+    {
+        "name": "Куриная грудка с овощами",
+        "ingredients": "Куриная грудка 150г, Брокколи 100г, Морковь 80г, Оливковое масло 1 ст.л.",
+        "instructions": "Запечь курицу с овощами в духовке",
+        "calories": 350,
+        "protein": 35,
+        "fat": 12,
+        "carbs": 15
+    },
+    {
+        "name": "Салат с тунцом",
+        "ingredients": "Тунец консервированный 100г, Листья салата 50г, Помидоры 100г, Огурцы 80г",
+        "instructions": "Смешать все ингредиенты, заправить лимонным соком",
+        "calories": 180,
+        "protein": 25,
+        "fat": 3,
+        "carbs": 8
+    },
+    {
+        "name": "Греческий йогурт с орехами",
+        "ingredients": "Греческий йогурт 150г, Орехи грецкие 20г, Мед 1 ч.л.",
+        "instructions": "Смешать йогурт с орехами и медом",
+        "calories": 220,
+        "protein": 15,
+        "fat": 12,
+        "carbs": 18
+    }
+)
+
+# Шаблоны строк плана питания
+_DAILY_ENTRY_TMPL = "  • {name} – {c:.0f} ккал\n"
+_ENTRY_TMPL = "{i}. <b>{name}</b>\n   Калории: {c:.0f} ккал\n   БЖУ: {p:.1f}г / {f:.1f}г / {cb:.1f}г\n\n"
+
+
+# Доли дневной нормы по приемам пищи: (прием пищи, калории, белки, жиры, углеводы)
+_MEAL_DIST = (
+    ("Завтрак", 0.25, 0.25, 0.30, 0.30),
+    ("Обед", 0.35, 0.40, 0.35, 0.35),
+    ("Ужин", 0.30, 0.30, 0.25, 0.25),
+    ("Перекус", 0.10, 0.05, 0.10, 0.10),
+)
+
+# Эмодзи для приемов пищи
+MEAL_EMOJI = {
+    "Завтрак": "🌅",
+    "Обед": "🍽",
+    "Ужин": "🌙",
+    "Перекус": "🍎"
+}
+
+# Границы отклонения от цели в процентах и соответствующие им отметки:
+# для отдельного блюда (до 15% / до 25% / больше) и для итога дня (до 5% / до 15% / больше)
+_DISH_DIFF_BOUNDS = (15, 25)
+_TOTAL_DIFF_BOUNDS = (5, 15)
+_DIFF_MARKS = (" ✅", " ⚠️", " ❗")
+_TOTAL_SUMMARIES = (
+    "🎯 Отлично! Рацион идеально соответствует вашим целям.",
+    "👍 Хорошо! Рацион близок к вашим целям.",
+    "⚡ Рацион требует корректировки. Используйте замену блюд.",
+)
+
+# Неизменные сообщения и клавиатуры, собираемые один раз при импорте
+_EMPTY_PLAN_TEXT = (
+    "❌ Не удалось сгенерировать рацион.\n\n"
+    "Возможные причины:\n"
+    "• Недостаточно рецептов в базе\n"
+    "• Все рецепты не подходят по калориям\n\n"
+    "💡 Добавьте больше разнообразных рецептов и попробуйте снова."
+)
+_EMPTY_PLAN_KB = types.InlineKeyboardMarkup(inline_keyboard=[
+    [types.InlineKeyboardButton(text="🍳 Добавить рецепты", callback_data="recipe:search")],
+    [types.InlineKeyboardButton(text="◀️ Назад", callback_data="meal_plan:back")]
+])
+
+_WEEKLY_PLAN_TEXT = (
+    "📅 <b>Генерация недельного рациона</b>\n\n"
+    "🔧 Функция генерации рациона на неделю находится в разработке.\n"
+    "Пока что вы можете генерировать рацион на каждый день отдельно."
+)
+_WEEKLY_PLAN_KB = types.InlineKeyboardMarkup(inline_keyboard=[
+    [types.InlineKeyboardButton(text="◀️ Назад", callback_data="meal_plan:back")]
+])
+
+# Калории и ID рецептов пользователя в виде кортежей, построенные по закэшированному списку рецептов
+_calorie_index = TTLCache(maxsize=1024, ttl=60)
+
+# Размер страницы списка рецептов при добавлении блюда в план
+_RECIPES_PAGE_SIZE = 20
+
+
+async def _edit_or_markup(message: types.Message, text, reply_markup):
+    """Редактирует сообщение: если текст не изменился, отправляет только новую клавиатуру."""
+    if message.html_text == text:
+        # Клавиатура тоже может совпадать — тогда Telegram ответит "message is not modified"
+        with suppress(TelegramBadRequest):
+            await message.edit_reply_markup(reply_markup=reply_markup)
+    else:
+        await message.edit_text(text=text, parse_mode="HTML", reply_markup=reply_markup)
+
+
+def _short(name, n=12):
+    """Обрезает название для подписи кнопки до n символов с многоточием."""
+    return name if len(name) <= n else name[:n] + "..."
+
 
 # Состояния для планировщика
 class MealPlanStates(StatesGroup):
@@ -54,12 +172,106 @@ class MealPlanStates(StatesGroup):
     generating_plan = State()
 
 
+async def _get_plan_date(callback_query: CallbackQuery, state: FSMContext):
+    """Возвращает дату плана из callback_data, а для старых кнопок без даты — из состояния."""
+    date = callback_query.data.rsplit(':', 1)[-1]
+    if len(date) == 10 and date[4] == '-':
+        return date
+
+    user_data = await state.get_data()
+    return user_data.get('selected_date', today_str())
+
+
+def _parse_plan_selection(data, user_data):
+    """
+    Разбирает callback_data вида "действие:<число>[:<прием>:<дата>]" при добавлении блюда в план.
+
+    Для старых кнопок без приема пищи и даты они берутся из состояния (user_data),
+    а дата по умолчанию — сегодняшняя.
+
+    Returns:
+        tuple: (действие, число, прием пищи, дата)
+    """
+    action, number, *rest = data.split(':', 3)
+    if len(rest) == 2:
+        meal_type, date = rest
+    else:
+        meal_type, date = user_data.get('meal_type'), user_data.get('selected_date', today_str())
+    return action, int(number), meal_type, date
+
+
+async def _copy_plan_to_diary(user_id, date, daily_plan):
+    """Переносит блюда плана в дневник одной пакетной вставкой.
+
+    Записи daily_plan из get_daily_meal_plan уже содержат название и КБЖУ рецепта
+    (запрос делает JOIN с recipes), поэтому рецепты повторно не запрашиваются.
+    Возвращает количество добавленных записей.
+    """
+    rows = [
+        (user_id, date, entry['meal_type'], entry['name'],
+         entry['calories'], entry['protein'], entry['fat'], entry['carbs'])
+        for entry in daily_plan
+    ]
+
+    if not rows:
+        return 0
+    return await db_call(add_food_entries_bulk, rows)
+
+
+def _get_calorie_index(user_id, recipes):
+    """Возвращает рецепты, отсортированные по калориям, и параллельный кортеж их калорий.
+
+    Индекс перестраивается только при смене закэшированного списка рецептов
+    (после сохранения или удаления рецепта get_saved_recipes вернет новый список).
+    """
+    entry = _calorie_index.get(user_id)
+    if entry is None or entry[0] is not recipes:
+        sorted_recipes = tuple(sorted(recipes, key=lambda r: float(r['calories'])))
+        calories = tuple(float(r['calories']) for r in sorted_recipes)
+        entry = (recipes, calories, sorted_recipes)
+        _calorie_index.set(user_id, entry)
+    return entry[1], entry[2]
+
+
+def _find_replacements(calories, recipes, exclude_id, target_calories):
+    """Подбирает замену блюду по отсортированному индексу калорий.
+
+    Идет от позиции целевой калорийности в обе стороны, то есть в порядке роста отклонения:
+    берет до 5 рецептов в пределах ±20%, а если таких нет — 3 ближайших по калориям.
+    """
+    low, high = target_calories * 0.8, target_calories * 1.2
+    n = len(calories)
+    left = bisect.bisect_left(calories, target_calories) - 1
+    right = left + 1
+
+    found = []
+    limit = 5
+    while len(found) < limit and (left >= 0 or right < n):
+        if right >= n or (left >= 0 and target_calories - calories[left] <= calories[right] - target_calories):
+            k = left
+            left -= 1
+        else:
+            k = right
+            right += 1
+
+        recipe = recipes[k]
+        if recipe['id'] == exclude_id:
+            continue
+        if limit == 5 and not low <= calories[k] <= high:
+            # Дальше рецепты только с большим отклонением, то есть тоже вне диапазона
+            if found:
+                break
+            limit = 3
+        found.append(recipe)
+    return found
+
+
 async def show_meal_planner(message: types.Message, state: FSMContext):
     """Показывает меню рациона питания."""
     user_id = message.from_user.id
 
     # Проверяем, зарегистрирован ли пользователь
-    user = get_user(user_id)
+    user = await db_call(get_user, user_id)
     if not user:
         await message.answer("Сначала нужно зарегистрироваться.")
         return
@@ -82,20 +294,31 @@ async def show_meal_planner(message: types.Message, state: FSMContext):
     )
 
 
-async def show_daily_plan(message: types.Message, state: FSMContext, selected_date=None):
-    """Показывает план питания на день."""
-    user_id = message.from_user.id
+async def show_daily_plan(message: types.Message, state: FSMContext, selected_date=None, daily_plan=None,
+                          edit=False, notice=None, user_id=None):
+    """Показывает план питания на день.
+
+    Если записи плана уже известны вызывающему коду, их можно передать в daily_plan,
+    чтобы не перечитывать план из базы данных. При edit=True план заменяет текст
+    сообщения message вместо отправки нового, а notice добавляется в начало текста.
+
+    Для сообщений бота (callback_query.message) from_user — это сам бот, поэтому
+    обработчики кнопок передают user_id = callback_query.from_user.id.
+    """
+    if user_id is None:
+        user_id = message.from_user.id
 
     # Если дата не указана, используем текущую
     if selected_date is None:
-        selected_date = datetime.now().strftime("%Y-%m-%d")
+        selected_date = today_str()
 
     # Сохраняем выбранную дату в состояние
     if state:
         await state.update_data(selected_date=selected_date)
 
     # Получаем данные о плане питания за выбранный день
-    daily_plan = get_daily_meal_plan(user_id, selected_date)
+    if daily_plan is None:
+        daily_plan = await db_call(get_daily_meal_plan, user_id, selected_date)
 
     # Группируем записи по типам приемов пищи
     meals = {}
@@ -107,50 +330,53 @@ async def show_daily_plan(message: types.Message, state: FSMContext, selected_da
         meals[meal_type].append(entry)
 
     # Формируем сообщение с планом
-    message_text = f"🍽 <b>План питания на {format_date(selected_date)}</b>\n\n"
+    parts = [f"{notice}\n\n"] if notice else []
+    parts.append(f"🍽 <b>План питания на {format_date(selected_date)}</b>\n\n")
 
     if not daily_plan:
-        message_text += "План питания на этот день еще не составлен.\n"
+        parts.append("План питания на этот день еще не составлен.\n")
     else:
         # Формируем записи по приемам пищи
         for meal_type in MEAL_TYPES:
             meal_entries = meals[meal_type]
             if meal_entries:
-                message_text += f"<b>{meal_type}:</b>\n"
+                parts.append(f"<b>{meal_type}:</b>\n")
 
                 # Считаем суммарные значения для приема пищи
-                meal_calories = sum(entry['calories'] for entry in meal_entries)
-
+                meal_calories = 0
                 for entry in meal_entries:
-                    message_text += f"  • {entry['name']} – {entry['calories']:.0f} ккал\n"
+                    meal_calories += entry['calories']
+                    parts.append(_DAILY_ENTRY_TMPL.format(name=entry['name'], c=entry['calories']))
+
+                parts.append(f"  Всего: {meal_calories:.0f} ккал\n\n")
 
-                message_text += f"  Всего: {meal_calories:.0f} ккал\n\n"
+    message_text = "".join(parts)
 
     # Создаем клавиатуру для действий с планом
     keyboard = [
         [
-            types.InlineKeyboardButton(text="◀️ Вчера", callback_data="plan_date:prev"),
+            types.InlineKeyboardButton(text="◀️ Вчера", callback_data=f"plan_date:prev:{selected_date}"),
             types.InlineKeyboardButton(text="Сегодня", callback_data="plan_date:today"),
-            types.InlineKeyboardButton(text="Завтра ▶️", callback_data="plan_date:next")
+            types.InlineKeyboardButton(text="Завтра ▶️", callback_data=f"plan_date:next:{selected_date}")
         ],
         [
-            types.InlineKeyboardButton(text="➕ Добавить блюдо", callback_data="plan:add"),
-            types.InlineKeyboardButton(text="🔄 Все рецепты", callback_data="plan:generate")
+            types.InlineKeyboardButton(text="➕ Добавить блюдо", callback_data=f"plan:add:{selected_date}"),
+            types.InlineKeyboardButton(text="🔄 Все рецепты", callback_data=f"plan:generate:{selected_date}")
         ]
     ]
 
     # Добавляем дополнительные кнопки, если план не пустой
     if daily_plan:
         keyboard.append([
-            types.InlineKeyboardButton(text="📝 Добавить в дневник", callback_data="plan:to_diary"),
-            types.InlineKeyboardButton(text="🗑 Очистить", callback_data="plan:clear")
+            types.InlineKeyboardButton(text="📝 Добавить в дневник", callback_data=f"plan:to_diary:{selected_date}"),
+            types.InlineKeyboardButton(text="🗑 Очистить", callback_data=f"plan:clear:{selected_date}")
         ])
 
     # Добавляем кнопки для просмотра отдельных приемов пищи
     for meal_type in MEAL_TYPES:
         if meals[meal_type]:
             keyboard.append([
-                types.InlineKeyboardButton(text=f"👁 {meal_type}", callback_data=f"plan:{meal_type}")
+                types.InlineKeyboardButton(text=f"👁 {meal_type}", callback_data=f"plan:{meal_type}:{selected_date}")
             ])
 
     # Добавляем кнопку возврата в главное меню
@@ -158,12 +384,12 @@ async def show_daily_plan(message: types.Message, state: FSMContext, selected_da
         types.InlineKeyboardButton(text="◀️ Главное меню", callback_data="plan:back")
     ])
 
-    # Отправляем сообщение
-    await message.answer(
-        text=message_text,
-        parse_mode="HTML",
-        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard)
-    )
+    # Отправляем сообщение или заменяем им текущее
+    markup = types.InlineKeyboardMarkup(inline_keyboard=keyboard)
+    if edit:
+        await _edit_or_markup(message, message_text, markup)
+    else:
+        await message.answer(text=message_text, parse_mode="HTML", reply_markup=markup)
 
 
 async def handle_plan_date_selection(callback_query: CallbackQuery, state: FSMContext):
@@ -175,35 +401,37 @@ async def handle_plan_date_selection(callback_query: CallbackQuery, state: FSMCo
 
         if date_action == "prev":
             # Получаем предыдущую дату
-            user_data = await state.get_data()
-            current_date = user_data.get('selected_date', datetime.now().strftime("%Y-%m-%d"))
+            current_date = await _get_plan_date(callback_query, state)
             current_date_obj = datetime.strptime(current_date, "%Y-%m-%d")
             prev_date = (current_date_obj - timedelta(days=1)).strftime("%Y-%m-%d")
 
-            await show_daily_plan(callback_query.message, state, prev_date)
+            await show_daily_plan(callback_query.message, state, prev_date, edit=True, user_id=callback_query.from_user.id)
         elif date_action == "next":
             # Получаем следующую дату
-            user_data = await state.get_data()
-            current_date = user_data.get('selected_date', datetime.now().strftime("%Y-%m-%d"))
+            current_date = await _get_plan_date(callback_query, state)
             current_date_obj = datetime.strptime(current_date, "%Y-%m-%d")
             next_date = (current_date_obj + timedelta(days=1)).strftime("%Y-%m-%d")
 
-            await show_daily_plan(callback_query.message, state, next_date)
+            await show_daily_plan(callback_query.message, state, next_date, edit=True, user_id=callback_query.from_user.id)
         elif date_action == "today":
             # Показываем текущую дату
-            today = datetime.now().strftime("%Y-%m-%d")
-            await show_daily_plan(callback_query.message, state, today)
+            today = today_str()
+            await show_daily_plan(callback_query.message, state, today, edit=True, user_id=callback_query.from_user.id)
         else:
             # Показываем выбранную дату
-            await show_daily_plan(callback_query.message, state, date_action)
+            await show_daily_plan(callback_query.message, state, date_action, edit=True, user_id=callback_query.from_user.id)
 
     await callback_query.answer()
 
 
 async def start_add_to_plan(callback_query: CallbackQuery, state: FSMContext):
     """Начинает процесс добавления блюда в план питания."""
-    # Показываем список приемов пищи
-    keyboard = create_meal_types_keyboard()
+    # Дата плана приходит в callback_data кнопки ("plan:add:<дата>")
+    selected_date = await _get_plan_date(callback_query, state)
+    await state.update_data(selected_date=selected_date)
+
+    # Показываем список приемов пищи; дата плана передается дальше в callback_data кнопок
+    keyboard = create_meal_types_keyboard(selected_date)
 
     await callback_query.message.answer(
         "Выберите прием пищи для добавления блюда:",
@@ -214,16 +442,55 @@ async def start_add_to_plan(callback_query: CallbackQuery, state: FSMContext):
     await callback_query.answer()
 
 
+def _build_recipes_page_keyboard(recipes, offset, has_next, selected_date, meal_type):
+    """Создает клавиатуру выбора рецепта для одной страницы списка.
+
+    Прием пищи и дата плана передаются в callback_data кнопок, чтобы выбор работал
+    и без данных в состоянии (например, после перезапуска бота).
+    """
+    suffix = f":{meal_type}:{selected_date}"
+    keyboard = []
+    for recipe in recipes:
+        keyboard.append([
+            types.InlineKeyboardButton(
+                text=f"{'★' if recipe['is_favorite'] else '☆'} {recipe['display_name']} ({recipe['calories']} ккал)",
+                callback_data=f"plan_recipe:{recipe['id']}{suffix}"
+            )
+        ])
+
+    # Кнопки переключения страниц
+    nav_row = []
+    if offset > 0:
+        nav_row.append(types.InlineKeyboardButton(
+            text="◀ Назад", callback_data=f"plan_recipes_page:{max(offset - _RECIPES_PAGE_SIZE, 0)}{suffix}"
+        ))
+    if has_next:
+        nav_row.append(types.InlineKeyboardButton(
+            text="Далее ▶", callback_data=f"plan_recipes_page:{offset + _RECIPES_PAGE_SIZE}{suffix}"
+        ))
+    if nav_row:
+        keyboard.append(nav_row)
+
+    # Добавляем кнопку отмены
+    keyboard.append([
+        types.InlineKeyboardButton(text="◀️ Отмена", callback_data=f"return_to_plan_view:{selected_date}")
+    ])
+
+    return types.InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
 async def handle_meal_type_selection(callback_query: CallbackQuery, state: FSMContext):
     """Обрабатывает выбор типа приема пищи для плана."""
     meal_type = callback_query.data.split(':')[1]
+    # Дата приходит в callback_data кнопки ("meal_type:<прием>:<дата>")
+    selected_date = await _get_plan_date(callback_query, state)
 
     # Сохраняем выбранный тип приема пищи
-    await state.update_data(meal_type=meal_type)
+    await state.update_data(meal_type=meal_type, selected_date=selected_date)
 
-    # Показываем список доступных рецептов
+    # Показываем первую страницу доступных рецептов
     user_id = callback_query.from_user.id
-    recipes = get_saved_recipes(user_id)
+    recipes = await db_call(get_saved_recipes_page, user_id, 0, _RECIPES_PAGE_SIZE + 1)
 
     if not recipes:
         await callback_query.message.answer(
@@ -234,46 +501,45 @@ async def handle_meal_type_selection(callback_query: CallbackQuery, state: FSMCo
         await callback_query.answer()
         return
 
-    # Создаем клавиатуру с рецептами
-    keyboard = []
-    for recipe in recipes:
-        recipe_name = recipe['name']
-        if len(recipe_name) > 30:
-            recipe_name = recipe_name[:27] + "..."
-
-        keyboard.append([
-            types.InlineKeyboardButton(
-                text=f"{'★' if recipe['is_favorite'] else '☆'} {recipe_name} ({recipe['calories']} ккал)",
-                callback_data=f"plan_recipe:{recipe['id']}"
-            )
-        ])
-
-    # Добавляем кнопку отмены
-    keyboard.append([
-        types.InlineKeyboardButton(text="◀️ Отмена", callback_data="return_to_plan_view")
-    ])
-
+    has_next = len(recipes) > _RECIPES_PAGE_SIZE
     await callback_query.message.answer(
         f"Выберите блюдо для {meal_type}:",
-        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard)
+        reply_markup=_build_recipes_page_keyboard(recipes[:_RECIPES_PAGE_SIZE], 0, has_next, selected_date, meal_type)
     )
 
     await state.set_state(MealPlanStates.selecting_recipe)
     await callback_query.answer()
 
 
+async def handle_plan_recipes_page(callback_query: CallbackQuery, state: FSMContext):
+    """Переключает страницу списка рецептов при добавлении блюда в план."""
+    # callback_data: "plan_recipes_page:<смещение>:<прием>:<дата>"
+    _, offset, meal_type, selected_date = _parse_plan_selection(callback_query.data, await state.get_data())
+
+    user_id = callback_query.from_user.id
+    recipes = await db_call(get_saved_recipes_page, user_id, offset, _RECIPES_PAGE_SIZE + 1)
+
+    if not recipes:
+        await callback_query.answer("Больше рецептов нет")
+        return
+
+    has_next = len(recipes) > _RECIPES_PAGE_SIZE
+    await callback_query.message.edit_reply_markup(
+        reply_markup=_build_recipes_page_keyboard(
+            recipes[:_RECIPES_PAGE_SIZE], offset, has_next, selected_date, meal_type
+        )
+    )
+    await callback_query.answer()
+
+
 async def handle_recipe_selection(callback_query: CallbackQuery, state: FSMContext):
     """Обрабатывает выбор рецепта для плана питания."""
-    recipe_id = int(callback_query.data.split(':')[1])
-
-    # Получаем данные из состояния
-    user_data = await state.get_data()
+    # callback_data: "plan_recipe:<id>:<прием>:<дата>"; у старых кнопок прием и дата берутся из состояния
+    _, recipe_id, meal_type, selected_date = _parse_plan_selection(callback_query.data, await state.get_data())
     user_id = callback_query.from_user.id
-    meal_type = user_data.get('meal_type')
-    selected_date = user_data.get('selected_date', datetime.now().strftime("%Y-%m-%d"))
 
     # Добавляем рецепт в план
-    plan_id = add_to_meal_plan(user_id, recipe_id, meal_type, selected_date)
+    plan_id = await db_call(add_to_meal_plan, user_id, recipe_id, meal_type, selected_date)
 
     if plan_id:
         await callback_query.message.answer(f"✅ Блюдо успешно добавлено в план на {meal_type.lower()}!")
@@ -282,21 +548,18 @@ async def handle_recipe_selection(callback_query: CallbackQuery, state: FSMConte
 
     # Очищаем состояние и возвращаемся к просмотру плана
     await state.clear()
-    await show_daily_plan(callback_query.message, state, selected_date)
+    await show_daily_plan(callback_query.message, state, selected_date, user_id=callback_query.from_user.id)
     await callback_query.answer()
 
 
 async def view_meal_type_plan(callback_query: CallbackQuery, state: FSMContext):
     """Показывает план для конкретного приема пищи с возможностью удаления."""
     meal_type = callback_query.data.split(':')[1]
-
-    # Получаем данные из состояния или устанавливаем текущую дату
-    user_data = await state.get_data()
     user_id = callback_query.from_user.id
-    selected_date = user_data.get('selected_date', datetime.now().strftime("%Y-%m-%d"))
+    selected_date = await _get_plan_date(callback_query, state)
 
     # Получаем блюда для этого приема пищи
-    meal_plan = get_meal_plan_for_type(user_id, meal_type, selected_date)
+    meal_plan = await db_call(get_meal_plan_for_type, user_id, meal_type, selected_date)
 
     if not meal_plan:
         await callback_query.message.answer(f"На {meal_type.lower()} пока нет запланированных блюд.")
@@ -304,7 +567,7 @@ async def view_meal_type_plan(callback_query: CallbackQuery, state: FSMContext):
         return
 
     # Формируем сообщение
-    message_text = f"🍽 <b>{meal_type} ({format_date(selected_date)})</b>\n\n"
+    parts = [f"🍽 <b>{meal_type} ({format_date(selected_date)})</b>\n\n"]
 
     # Считаем общие значения
     total_calories = 0
@@ -314,9 +577,10 @@ async def view_meal_type_plan(callback_query: CallbackQuery, state: FSMContext):
 
     # Добавляем информацию о каждом блюде
     for i, entry in enumerate(meal_plan, 1):
-        message_text += f"{i}. <b>{entry['name']}</b>\n"
-        message_text += f"   Калории: {entry['calories']:.0f} ккал\n"
-        message_text += f"   БЖУ: {entry['protein']:.1f}г / {entry['fat']:.1f}г / {entry['carbs']:.1f}г\n\n"
+        parts.append(_ENTRY_TMPL.format(
+            i=i, name=entry['name'], c=entry['calories'],
+            p=entry['protein'], f=entry['fat'], cb=entry['carbs']
+        ))
 
         # Суммируем значения
         total_calories += entry['calories']
@@ -325,9 +589,12 @@ async def view_meal_type_plan(callback_query: CallbackQuery, state: FSMContext):
         total_carbs += entry['carbs']
 
     # Добавляем общую информацию
-    message_text += f"<b>Всего для {meal_type.lower()}:</b>\n"
-    message_text += f"Калории: {total_calories:.0f} ккал\n"
-    message_text += f"БЖУ: {total_protein:.1f}г / {total_fat:.1f}г / {total_carbs:.1f}г\n"
+    parts.append(
+        f"<b>Всего для {meal_type.lower()}:</b>\n"
+        f"Калории: {total_calories:.0f} ккал\n"
+        f"БЖУ: {total_protein:.1f}г / {total_fat:.1f}г / {total_carbs:.1f}г\n"
+    )
+    message_text = "".join(parts)
 
     # Создаем клавиатуру для действий
     keyboard = []
@@ -336,14 +603,14 @@ async def view_meal_type_plan(callback_query: CallbackQuery, state: FSMContext):
     for entry in meal_plan:
         keyboard.append([
             types.InlineKeyboardButton(
-                text=f"🗑 Удалить {entry['name'][:20] + '...' if len(entry['name']) > 20 else entry['name']}",
-                callback_data=f"delete_plan_entry:{entry['id']}"
+                text=f"🗑 Удалить {entry['display_name']}",
+                callback_data=f"delete_plan_entry:{entry['id']}:{selected_date}"
             )
         ])
 
     # Добавляем кнопку для возврата
     keyboard.append([
-        types.InlineKeyboardButton(text="◀️ Назад к плану", callback_data="return_to_plan_view")
+        types.InlineKeyboardButton(text="◀️ Назад к плану", callback_data=f"return_to_plan_view:{selected_date}")
     ])
 
     await callback_query.message.answer(
@@ -360,7 +627,7 @@ async def delete_plan_entry(callback_query: CallbackQuery, state: FSMContext):
     plan_id = int(callback_query.data.split(':')[1])
 
     # Удаляем запись
-    success = remove_from_meal_plan(plan_id)
+    success = await db_call(remove_from_meal_plan, plan_id)
 
     if success:
         # Редактируем текущее сообщение вместо отправки нового
@@ -371,22 +638,20 @@ async def delete_plan_entry(callback_query: CallbackQuery, state: FSMContext):
         await callback_query.message.edit_text("❌ Не удалось удалить блюдо. Попробуйте еще раз.")
 
     # Возвращаемся к просмотру плана
-    user_data = await state.get_data()
-    selected_date = user_data.get('selected_date', datetime.now().strftime("%Y-%m-%d"))
-    await show_daily_plan(callback_query.message, state, selected_date)
+    selected_date = await _get_plan_date(callback_query, state)
+    await show_daily_plan(callback_query.message, state, selected_date, user_id=callback_query.from_user.id)
     await callback_query.answer()
 
 
 async def clear_plan(callback_query: CallbackQuery, state: FSMContext):
     """Очищает план питания на выбранный день."""
     # Запрашиваем подтверждение
-    user_data = await state.get_data()
-    selected_date = user_data.get('selected_date', datetime.now().strftime("%Y-%m-%d"))
+    selected_date = await _get_plan_date(callback_query, state)
 
     keyboard = [
         [
             types.InlineKeyboardButton(text="✅ Да", callback_data=f"confirm_clear_plan:{selected_date}"),
-            types.InlineKeyboardButton(text="❌ Нет", callback_data="cancel_clear_plan")
+            types.InlineKeyboardButton(text="❌ Нет", callback_data=f"cancel_clear_plan:{selected_date}")
         ]
     ]
 
@@ -403,60 +668,41 @@ async def confirm_clear_plan(callback_query: CallbackQuery, state: FSMContext):
     user_id = callback_query.from_user.id
 
     # Очищаем план
-    success = clear_meal_plan(user_id, date)
+    success = await db_call(clear_meal_plan, user_id, date)
 
     if success:
-        await callback_query.message.answer(f"✅ План питания на {format_date(date)} очищен!")
+        notice = f"✅ План питания на {format_date(date)} очищен!"
     else:
-        await callback_query.message.answer("❌ Не удалось очистить план. Попробуйте еще раз.")
+        notice = "❌ Не удалось очистить план. Попробуйте еще раз."
 
-    # Показываем обновленный план
-    await show_daily_plan(callback_query.message, state, date)
+    # Показываем обновленный план вместо сообщения с подтверждением
+    await show_daily_plan(callback_query.message, state, date, edit=True, notice=notice, user_id=callback_query.from_user.id)
     await callback_query.answer()
 
 
 async def cancel_clear_plan(callback_query: CallbackQuery, state: FSMContext):
     """Отменяет очистку плана питания."""
-    await callback_query.message.answer("Очистка плана отменена.")
-
-    # Показываем план
-    user_data = await state.get_data()
-    selected_date = user_data.get('selected_date', datetime.now().strftime("%Y-%m-%d"))
-    await show_daily_plan(callback_query.message, state, selected_date)
+    # Показываем план вместо сообщения с подтверждением
+    selected_date = await _get_plan_date(callback_query, state)
+    await show_daily_plan(callback_query.message, state, selected_date, edit=True, user_id=callback_query.from_user.id)
     await callback_query.answer()
 
 
 async def transfer_plan_to_diary(callback_query: CallbackQuery, state: FSMContext):
     """Переносит блюда из плана питания в дневник."""
-    user_data = await state.get_data()
     user_id = callback_query.from_user.id
-    selected_date = user_data.get('selected_date', datetime.now().strftime("%Y-%m-%d"))
+    selected_date = await _get_plan_date(callback_query, state)
 
     # Получаем план питания на выбранный день
-    daily_plan = get_daily_meal_plan(user_id, selected_date)
+    daily_plan = await db_call(get_daily_meal_plan, user_id, selected_date)
 
     if not daily_plan:
         await callback_query.message.answer("План питания на этот день пуст.")
         await callback_query.answer()
         return
 
-    # Переносим каждое блюдо в дневник
-    for entry in daily_plan:
-        # Получаем детали рецепта
-        recipe = get_recipe_details(entry['recipe_id'])
-
-        if recipe:
-            # Добавляем запись в дневник питания
-            add_food_entry(
-                user_id,
-                selected_date,
-                entry['meal_type'],
-                recipe['name'],
-                recipe['calories'],
-                recipe['protein'],
-                recipe['fat'],
-                recipe['carbs']
-            )
+    # Переносим все блюда в дневник
+    await _copy_plan_to_diary(user_id, selected_date, daily_plan)
 
     await callback_query.message.answer(
         f"✅ План питания на {format_date(selected_date)} добавлен в дневник!"
@@ -467,24 +713,20 @@ async def transfer_plan_to_diary(callback_query: CallbackQuery, state: FSMContex
 async def generate_meal_plan(callback_query: CallbackQuery, state: FSMContext):
     """Генерирует план питания на основе целей пользователя."""
     user_id = callback_query.from_user.id
-    user = get_user(user_id)
+    user = await db_call(get_user, user_id)
 
     if not user:
         await callback_query.message.answer("Сначала нужно зарегистрироваться.")
         await callback_query.answer()
         return
 
-    user_data = await state.get_data()
-    selected_date = user_data.get('selected_date', datetime.now().strftime("%Y-%m-%d"))
-
-    # Сначала очищаем текущий план на выбранный день
-    clear_meal_plan(user_id, selected_date)
+    selected_date = await _get_plan_date(callback_query, state)
 
     # Получаем цель по калориям
     goal_calories = user['goal_calories']
 
     # Получаем сохраненные рецепты
-    recipes = get_saved_recipes(user_id)
+    recipes = await db_call(get_saved_recipes, user_id)
 
     if not recipes:
         await callback_query.message.answer(
@@ -494,56 +736,64 @@ async def generate_meal_plan(callback_query: CallbackQuery, state: FSMContext):
         await callback_query.answer()
         return
 
-    # Пытаемся распределить калории по приемам пищи
-    # Завтрак: 25%, Обед: 35%, Ужин: 30%, Перекус: 10%
-    meal_calories = {
-        "Завтрак": goal_calories * 0.25,
-        "Обед": goal_calories * 0.35,
-        "Ужин": goal_calories * 0.30,
-        "Перекус": goal_calories * 0.10
-    }
-
-    # Для каждого приема пищи находим подходящие рецепты
-    for meal_type, target_calories in meal_calories.items():
-        await callback_query.message.answer(f"Подбираем блюда для {meal_type.lower()}...")
-
-        # Сначала пытаемся найти рецепты с калориями в пределах ±15% от целевых
-        suitable_recipes = [
-            r for r in recipes
-            if target_calories * 0.85 <= r['calories'] <= target_calories * 1.15
-        ]
-
-        # Если не нашли подходящих, расширяем диапазон до ±25%
-        if not suitable_recipes:
-            suitable_recipes = [
-                r for r in recipes
-                if target_calories * 0.75 <= r['calories'] <= target_calories * 1.25
-            ]
-
-        # Если все еще нет подходящих, берем ближайший по калориям
-        if not suitable_recipes and recipes:
-            # Сортируем по абсолютной разнице с целевыми калориями
-            recipes_sorted = sorted(recipes, key=lambda r: abs(r['calories'] - target_calories))
-            suitable_recipes = [recipes_sorted[0]]
-
-        # Добавляем выбранный рецепт в план
+    # Одно сообщение о ходе генерации вместо отдельного сообщения на каждый прием пищи
+    status = await callback_query.message.edit_text("🔄 Генерирую план питания...")
+
+    # Для каждого приема пищи находим подходящие рецепты,
+    # распределяя калории по приемам пищи: Завтрак 25%, Обед 35%, Ужин 30%, Перекус 10%
+    daily_plan = []
+    for meal_type, cal_frac, *_ in _MEAL_DIST:
+        target_calories = goal_calories * cal_frac
+
+        # За один проход собираем рецепты в пределах ±15% и ±25% от целевых калорий
+        narrow_low, narrow_high = target_calories * 0.85, target_calories * 1.15
+        wide_low, wide_high = target_calories * 0.75, target_calories * 1.25
+        narrow_recipes = []
+        wide_recipes = []
+        for r in recipes:
+            calories = r['calories']
+            if wide_low <= calories <= wide_high:
+                wide_recipes.append(r)
+                if narrow_low <= calories <= narrow_high:
+                    narrow_recipes.append(r)
+
+        suitable_recipes = narrow_recipes or wide_recipes
         if suitable_recipes:
             selected_recipe = random.choice(suitable_recipes)
-            add_to_meal_plan(user_id, selected_recipe['id'], meal_type, selected_date)
-
-    await callback_query.message.answer("✅ План питания сгенерирован успешно!")
+        else:
+            # Если подходящих нет, берем ближайший по калориям
+            selected_recipe = min(recipes, key=lambda r: abs(r['calories'] - target_calories))
+
+        daily_plan.append({
+            'meal_type': meal_type,
+            'recipe_id': selected_recipe['id'],
+            'name': selected_recipe['name'],
+            'calories': selected_recipe['calories'],
+            'protein': selected_recipe['protein'],
+            'fat': selected_recipe['fat'],
+            'carbs': selected_recipe['carbs']
+        })
+
+    # Заменяем текущий план на выбранный день одной транзакцией
+    plan_rows = [(entry['recipe_id'], entry['meal_type']) for entry in daily_plan]
+    if not await db_call(replace_daily_plan, user_id, selected_date, plan_rows):
+        await status.edit_text("❌ Не удалось сохранить план питания. Попробуйте еще раз.")
+        await callback_query.answer()
+        return
 
-    # Показываем созданный план
-    await show_daily_plan(callback_query.message, state, selected_date)
+    # Показываем созданный план из уже подобранных блюд, не перечитывая его из базы
+    await show_daily_plan(
+        status, state, selected_date, daily_plan=daily_plan,
+        edit=True, notice="✅ План питания сгенерирован успешно!", user_id=user_id
+    )
     await callback_query.answer()
 
 
 async def return_to_plan_view(callback_query: CallbackQuery, state: FSMContext):
     """Возвращает к просмотру плана питания."""
-    user_data = await state.get_data()
-    selected_date = user_data.get('selected_date', datetime.now().strftime("%Y-%m-%d"))
+    selected_date = await _get_plan_date(callback_query, state)
 
-    await show_daily_plan(callback_query.message, state, selected_date)
+    await show_daily_plan(callback_query.message, state, selected_date, user_id=callback_query.from_user.id)
     await callback_query.answer()
 
 
@@ -558,11 +808,9 @@ async def handle_meal_plan_menu(callback_query: CallbackQuery, state: FSMContext
         elif action == "week":
             await generate_weekly_meal_plan(callback_query, state)
         elif action == "back":
-            from keyboards import after_calories_keyboard
-            try:
+            # Сообщение могло быть уже удалено или слишком старым для удаления
+            with suppress(TelegramBadRequest):
                 await callback_query.message.delete()
-            except:
-                pass  # Игнорируем ошибки удаления сообщения
             await callback_query.message.answer(
                 "Вы вернулись в главное меню",
                 reply_markup=after_calories_keyboard
@@ -576,7 +824,7 @@ async def handle_meal_plan_menu(callback_query: CallbackQuery, state: FSMContext
 async def generate_daily_meal_plan(callback_query: CallbackQuery, state: FSMContext):
     """Генерирует рацион на сегодня."""
     user_id = callback_query.from_user.id
-    user = get_user(user_id)
+    user = await db_call(get_user, user_id)
 
     if not user:
         await callback_query.message.edit_text("Сначала нужно зарегистрироваться.")
@@ -602,13 +850,10 @@ async def generate_daily_meal_plan(callback_query: CallbackQuery, state: FSMCont
         goal_carbs = user['carbs']
 
         # Текущая дата
-        today = datetime.now().strftime("%Y-%m-%d")
-
-        # Очищаем текущий план на сегодня
-        clear_meal_plan(user_id, today)
+        today = today_str()
 
         # Получаем сохраненные рецепты пользователя
-        recipes = get_saved_recipes(user_id)
+        recipes = await db_call(get_saved_recipes, user_id)
 
         if not recipes:
             keyboard = [
@@ -627,45 +872,43 @@ async def generate_daily_meal_plan(callback_query: CallbackQuery, state: FSMCont
         # Создаем базовые блюда для демонстрации, если у пользователя мало рецептов
         if len(recipes) < 4:
             await create_demo_recipes(user_id)
-            recipes = get_saved_recipes(user_id)
-
-        # Распределяем калории и макронутриенты по приемам пищи
-        meal_distribution = {
-            "Завтрак": {"calories": 0.25, "protein": 0.25, "fat": 0.30, "carbs": 0.30},
-            "Обед": {"calories": 0.35, "protein": 0.40, "fat": 0.35, "carbs": 0.35},
-            "Ужин": {"calories": 0.30, "protein": 0.30, "fat": 0.25, "carbs": 0.25},
-            "Перекус": {"calories": 0.10, "protein": 0.05, "fat": 0.10, "carbs": 0.10}
-        }
+            recipes = await db_call(get_saved_recipes, user_id)
 
         generated_plan = []
+        plan_rows = []
+        used_ids = set()  # Уже выбранные рецепты, чтобы блюда не повторялись
         total_actual_calories = 0
         total_actual_protein = 0
         total_actual_fat = 0
         total_actual_carbs = 0
 
-        for meal_type, distribution in meal_distribution.items():
-            target_calories = goal_calories * distribution["calories"]
-            target_protein = goal_protein * distribution["protein"]
-            target_fat = goal_fat * distribution["fat"]
-            target_carbs = goal_carbs * distribution["carbs"]
+        # Распределяем калории и макронутриенты по приемам пищи
+        for meal_type, cal_frac, prot_frac, fat_frac, carb_frac in _MEAL_DIST:
+            target_calories = goal_calories * cal_frac
+            target_protein = goal_protein * prot_frac
+            target_fat = goal_fat * fat_frac
+            target_carbs = goal_carbs * carb_frac
 
             # Находим подходящие рецепты по калориям
             suitable_recipes = []
             
             # Сначала ищем рецепты в узком диапазоне (±20%)
             for recipe in recipes:
-                if (target_calories * 0.8 <= recipe['calories'] <= target_calories * 1.2):
+                if recipe['id'] not in used_ids and (target_calories * 0.8 <= recipe['calories'] <= target_calories * 1.2):
                     suitable_recipes.append(recipe)
 
             # Если не нашли, расширяем диапазон (±40%)
             if not suitable_recipes:
                 for recipe in recipes:
-                    if (target_calories * 0.6 <= recipe['calories'] <= target_calories * 1.4):
+                    if recipe['id'] not in used_ids and (target_calories * 0.6 <= recipe['calories'] <= target_calories * 1.4):
                         suitable_recipes.append(recipe)
 
             # Если все еще нет подходящих, берем ближайший по калориям
             if not suitable_recipes:
-                suitable_recipes = sorted(recipes, key=lambda r: abs(r['calories'] - target_calories))[:3]
+                suitable_recipes = sorted(
+                    (r for r in recipes if r['id'] not in used_ids),
+                    key=lambda r: abs(r['calories'] - target_calories)
+                )[:3]
 
             if suitable_recipes:
                 # Выбираем рецепт, который лучше всего подходит по БЖУ
@@ -688,7 +931,7 @@ async def generate_daily_meal_plan(callback_query: CallbackQuery, state: FSMCont
 
                 if best_recipe:
                     # Добавляем в план питания
-                    add_to_meal_plan(user_id, best_recipe['id'], meal_type, today)
+                    plan_rows.append((best_recipe['id'], meal_type))
                     generated_plan.append({
                         'meal_type': meal_type,
                         'recipe': best_recipe,
@@ -701,8 +944,11 @@ async def generate_daily_meal_plan(callback_query: CallbackQuery, state: FSMCont
                     total_actual_fat += best_recipe['fat']
                     total_actual_carbs += best_recipe['carbs']
 
-                    # Удаляем выбранный рецепт из доступных, чтобы не повторяться
-                    recipes = [r for r in recipes if r['id'] != best_recipe['id']]
+                    # Помечаем рецепт как использованный, чтобы не повторяться
+                    used_ids.add(best_recipe['id'])
+
+        # Заменяем план на сегодня одной транзакцией
+        await db_call(replace_daily_plan, user_id, today, plan_rows)
 
         if generated_plan:
             # Добавляем информацию о соответствии целям
@@ -749,109 +995,36 @@ async def generate_daily_meal_plan(callback_query: CallbackQuery, state: FSMCont
 
 async def create_demo_recipes(user_id):
     """Создает демонстрационные рецепты для новых пользователей."""
-    from database import save_recipe
-    
-    demo_recipes = [
-        {
-            "name": "Овсяная каша с ягодами",
-            "ingredients": "Овсяные хлопья 50г, Молоко 200мл, Ягоды 100г, Мед 1 ч.л.",
-            "instructions": "Сварить овсянку на молоке, добавить ягоды и мед",
-            "calories": 280,
-            "protein": 12,
-            "fat": 6,
-            "carbs": 45
-        },
-        {
-            "name": "Куриная грудка с овощами",
-            "ingredients": "Куриная грудка 150г, Брокколи 100г, Морковь 80г, Оливковое масло 1 ст.л.",
-            "instructions": "Запечь курицу с овощами в духовке",
-            "calories": 350,
-            "protein": 35,
-            "fat": 12,
-            "carbs": 15
-        },
-        {
-            "name": "Салат с тунцом",
-            "ingredients": "Тунец консервированный 100г, Листья салата 50г, Помидоры 100г, Огурцы 80г",
-            "instructions": "Смешать все ингредиенты, заправить лимонным соком",
-            "calories": 180,
-            "protein": 25,
-            "fat": 3,
-            "carbs": 8
-        },
-        {
-            "name": "Греческий йогурт с орехами",
-            "ingredients": "Греческий йогурт 150г, Орехи грецкие 20г, Мед 1 ч.л.",
-            "instructions": "Смешать йогурт с орехами и медом",
-            "calories": 220,
-            "protein": 15,
-            "fat": 12,
-            "carbs": 18
-        }
-    ]
-    
-    for recipe in demo_recipes:
-        save_recipe(
-            user_id,
-            recipe["name"],
-            recipe["ingredients"],
-            recipe["instructions"],
-            recipe["calories"],
-            recipe["protein"],
-            recipe["fat"],
-            recipe["carbs"]
-        )
+    await db_call(save_recipes_bulk, user_id, _DEMO_RECIPES)
 
 
 async def show_generated_daily_plan(callback_query: CallbackQuery, state: FSMContext, plan, date, plan_info=None):
     """Показывает сгенерированный план на день с детальной информацией."""
     
     if not plan:
-        keyboard = [
-            [types.InlineKeyboardButton(text="🍳 Добавить рецепты", callback_data="recipe:search")],
-            [types.InlineKeyboardButton(text="◀️ Назад", callback_data="meal_plan:back")]
-        ]
-        await callback_query.message.edit_text(
-            "❌ Не удалось сгенерировать рацион.\n\n"
-            "Возможные причины:\n"
-            "• Недостаточно рецептов в базе\n"
-            "• Все рецепты не подходят по калориям\n\n"
-            "💡 Добавьте больше разнообразных рецептов и попробуйте снова.",
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard)
-        )
+        await callback_query.message.edit_text(_EMPTY_PLAN_TEXT, reply_markup=_EMPTY_PLAN_KB)
         return
 
-    message_text = f"🍽 <b>Персональный рацион на {format_date(date)}</b>\n\n"
+    parts = [f"🍽 <b>Персональный рацион на {format_date(date)}</b>\n\n"]
 
     # Отображаем блюда по приемам пищи
     for item in plan:
         recipe = item['recipe']
         meal_type = item['meal_type']
         target_calories = item.get('target_calories', 0)
+        calories = recipe['calories']
 
-        # Эмодзи для приемов пищи
-        meal_emoji = {
-            "Завтрак": "🌅",
-            "Обед": "🍽",
-            "Ужин": "🌙", 
-            "Перекус": "🍎"
-        }
-        
-        emoji = meal_emoji.get(meal_type, "🍽")
-        message_text += f"{emoji} <b>{meal_type}:</b>\n"
-        message_text += f"   🥘 {recipe['name']}\n"
-        message_text += f"   📊 {recipe['calories']:.0f} ккал"
-        
+        mark = ""
         if target_calories > 0:
-            diff_percent = ((recipe['calories'] - target_calories) / target_calories) * 100
-            if abs(diff_percent) <= 15:
-                message_text += " ✅"
-            elif abs(diff_percent) <= 25:
-                message_text += " ⚠️"
-            else:
-                message_text += " ❗"
-        
-        message_text += f"\n   🥩 Б: {recipe['protein']:.1f}г | 🥑 Ж: {recipe['fat']:.1f}г | 🍞 У: {recipe['carbs']:.1f}г\n\n"
+            diff_percent = abs((calories - target_calories) / target_calories) * 100
+            mark = _DIFF_MARKS[bisect.bisect_left(_DISH_DIFF_BOUNDS, diff_percent)]
+
+        parts.append(
+            f"{MEAL_EMOJI.get(meal_type, '🍽')} <b>{meal_type}:</b>\n"
+            f"   🥘 {recipe['name']}\n"
+            f"   📊 {calories:.0f} ккал{mark}\n"
+            f"   🥩 Б: {recipe['protein']:.1f}г | 🥑 Ж: {recipe['fat']:.1f}г | 🍞 У: {recipe['carbs']:.1f}г\n\n"
+        )
 
     # Итоговая информация
     if plan_info:
@@ -864,55 +1037,52 @@ async def show_generated_daily_plan(callback_query: CallbackQuery, state: FSMCon
         goal_fat = plan_info['goal_fat']
         goal_carbs = plan_info['goal_carbs']
 
-        message_text += "📈 <b>Итого за день:</b>\n"
-        message_text += f"🔥 Калории: {total_calories:.0f} / {goal_calories:.0f} ккал"
-        
-        cal_diff = total_calories - goal_calories
-        if abs(cal_diff) <= goal_calories * 0.05:  # В пределах 5%
-            message_text += " ✅\n"
-        elif abs(cal_diff) <= goal_calories * 0.15:  # В пределах 15%
-            message_text += " ⚠️\n"
-        else:
-            message_text += " ❗\n"
-
-        message_text += f"🥩 Белки: {total_protein:.1f} / {goal_protein}г\n"
-        message_text += f"🥑 Жиры: {total_fat:.1f} / {goal_fat}г\n"
-        message_text += f"🍞 Углеводы: {total_carbs:.1f} / {goal_carbs}г\n\n"
-
-        # Анализ соответствия целям
-        cal_percentage = (total_calories / goal_calories) * 100
-        if 95 <= cal_percentage <= 105:
-            message_text += "🎯 Отлично! Рацион идеально соответствует вашим целям."
-        elif 85 <= cal_percentage <= 115:
-            message_text += "👍 Хорошо! Рацион близок к вашим целям."
-        else:
-            message_text += "⚡ Рацион требует корректировки. Используйте замену блюд."
+        # Отметка и анализ соответствия целям: пределы 5% и 15% общие для обоих
+        cal_diff_percent = abs(total_calories - goal_calories) / goal_calories * 100
+        level = bisect.bisect_left(_TOTAL_DIFF_BOUNDS, cal_diff_percent)
+        cal_mark = _DIFF_MARKS[level]
+        summary = _TOTAL_SUMMARIES[level]
+
+        parts.append(
+            "📈 <b>Итого за день:</b>\n"
+            f"🔥 Калории: {total_calories:.0f} / {goal_calories:.0f} ккал{cal_mark}\n"
+            f"🥩 Белки: {total_protein:.1f} / {goal_protein}г\n"
+            f"🥑 Жиры: {total_fat:.1f} / {goal_fat}г\n"
+            f"🍞 Углеводы: {total_carbs:.1f} / {goal_carbs}г\n\n"
+            f"{summary}"
+        )
     else:
-        # Подсчет без детальной информации
-        total_calories = sum(item['recipe']['calories'] for item in plan)
-        total_protein = sum(item['recipe']['protein'] for item in plan)
-        total_fat = sum(item['recipe']['fat'] for item in plan)
-        total_carbs = sum(item['recipe']['carbs'] for item in plan)
-
-        message_text += f"📈 <b>Итого за день:</b>\n"
-        message_text += f"🔥 Калории: {total_calories:.0f} ккал\n"
-        message_text += f"🥩 Белки: {total_protein:.1f}г\n"
-        message_text += f"🥑 Жиры: {total_fat:.1f}г\n"
-        message_text += f"🍞 Углеводы: {total_carbs:.1f}г"
+        # Подсчет без детальной информации: все итоги за один проход
+        total_calories = total_protein = total_fat = total_carbs = 0.0
+        for item in plan:
+            recipe = item['recipe']
+            total_calories += recipe['calories']
+            total_protein += recipe['protein']
+            total_fat += recipe['fat']
+            total_carbs += recipe['carbs']
+
+        parts.append(
+            "📈 <b>Итого за день:</b>\n"
+            f"🔥 Калории: {total_calories:.0f} ккал\n"
+            f"🥩 Белки: {total_protein:.1f}г\n"
+            f"🥑 Жиры: {total_fat:.1f}г\n"
+            f"🍞 Углеводы: {total_carbs:.1f}г"
+        )
+
+    message_text = "".join(parts)
 
     # Создаем клавиатуру с возможностью замены блюд и сохранения
     keyboard = []
 
     if len(plan) > 0:
-        # Кнопки замены блюд
+        # Кнопки замены блюд; хвост callback_data с датой общий для всех кнопок
+        date_suffix = f":{date}"
         for item in plan:
             recipe = item['recipe']
-            meal_type = item['meal_type']
-            recipe_name = recipe['name'][:12] + "..." if len(recipe['name']) > 12 else recipe['name']
             keyboard.append([
                 types.InlineKeyboardButton(
-                    text=f"🔄 Заменить {recipe_name}",
-                    callback_data=f"replace_dish:{recipe['id']}:{meal_type}:{date}"
+                    text=f"🔄 Заменить {_short(recipe['name'])}",
+                    callback_data=f"replace_dish:{recipe['id']}:{item['meal_type']}" + date_suffix
                 )
             ])
 
@@ -942,20 +1112,15 @@ async def show_generated_daily_plan(callback_query: CallbackQuery, state: FSMCon
 
 async def generate_weekly_meal_plan(callback_query: CallbackQuery, state: FSMContext):
     """Генерирует рацион на неделю."""
-    await callback_query.message.answer(
-        "📅 <b>Генерация недельного рациона</b>\n\n"
-        "🔧 Функция генерации рациона на неделю находится в разработке.\n"
-        "Пока что вы можете генерировать рацион на каждый день отдельно.",
-        parse_mode="HTML",
-        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
-            [types.InlineKeyboardButton(text="◀️ Назад", callback_data="meal_plan:back")]
-        ])
-    )
+    await callback_query.message.answer(_WEEKLY_PLAN_TEXT, parse_mode="HTML", reply_markup=_WEEKLY_PLAN_KB)
     await callback_query.answer()
 
 
 async def handle_replace_dish(callback_query: CallbackQuery, state: FSMContext):
     """Обрабатывает замену блюда в рационе."""
+    # Сразу снимаем индикатор загрузки с кнопки, ошибки сообщаем отдельным сообщением
+    await callback_query.answer()
+
     data = callback_query.data.split(':')
     recipe_id = int(data[1])
     meal_type = data[2]
@@ -963,46 +1128,40 @@ async def handle_replace_dish(callback_query: CallbackQuery, state: FSMContext):
 
     user_id = callback_query.from_user.id
 
-    # Получаем текущий рецепт для определения целевых калорий
-    current_recipe = get_recipe_details(recipe_id)
+    # Текущий рецепт (для целевых калорий) и все рецепты пользователя запрашиваем параллельно
+    current_recipe, all_recipes = await asyncio.gather(
+        db_call(get_recipe_details, recipe_id),
+        db_call(get_saved_recipes, user_id)
+    )
     if not current_recipe:
-        await callback_query.answer("Ошибка: рецепт не найден")
+        await callback_query.message.answer("Ошибка: рецепт не найден")
         return
 
     target_calories = current_recipe['calories']
 
-    # Получаем все рецепты пользователя кроме текущего
-    all_recipes = get_saved_recipes(user_id)
-    available_recipes = [r for r in all_recipes if r['id'] != recipe_id]
-
-    if not available_recipes:
-        await callback_query.answer("Нет других рецептов для замены")
-        return
-
-    # Находим похожие по калориям рецепты
-    similar_recipes = [
-        r for r in available_recipes
-        if target_calories * 0.8 <= r['calories'] <= target_calories * 1.2
-    ]
+    # Похожие по калориям рецепты (±20%) или 3 ближайших ищем по отсортированному индексу
+    calories, sorted_recipes = _get_calorie_index(user_id, all_recipes)
+    similar_recipes = _find_replacements(calories, sorted_recipes, recipe_id, float(target_calories))
 
     if not similar_recipes:
-        # Если нет похожих, берем 3 ближайших по калориям
-        similar_recipes = sorted(
-            available_recipes, 
-            key=lambda r: abs(r['calories'] - target_calories)
-        )[:3]
+        await callback_query.message.answer("Нет других рецептов для замены")
+        return
 
     # Показываем варианты замены
     message_text = f"🔄 <b>Замена блюда для {meal_type}</b>\n\n"
     message_text += f"Текущее: {current_recipe['name']} ({current_recipe['calories']} ккал)\n\n"
     message_text += "Выберите замену:"
 
+    # Постоянные части callback_data собираем один раз
+    cb_prefix = f"confirm_replace:{recipe_id}:"
+    cb_suffix = f":{meal_type}:{date}"
+
     keyboard = []
-    for recipe in similar_recipes[:5]:  # Показываем максимум 5 вариантов
+    for recipe in similar_recipes:  # Показываем максимум 5 вариантов
         keyboard.append([
             types.InlineKeyboardButton(
                 text=f"{recipe['name']} ({recipe['calories']} ккал)",
-                callback_data=f"confirm_replace:{recipe_id}:{recipe['id']}:{meal_type}:{date}"
+                callback_data=f"{cb_prefix}{recipe['id']}{cb_suffix}"
             )
         ])
 
@@ -1015,11 +1174,12 @@ async def handle_replace_dish(callback_query: CallbackQuery, state: FSMContext):
         parse_mode="HTML",
         reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard)
     )
-    await callback_query.answer()
 
 
 async def confirm_replace_dish(callback_query: CallbackQuery, state: FSMContext):
     """Подтверждает замену блюда."""
+    await callback_query.answer()
+
     data = callback_query.data.split(':')
     old_recipe_id = int(data[1])
     new_recipe_id = int(data[2])
@@ -1029,68 +1189,51 @@ async def confirm_replace_dish(callback_query: CallbackQuery, state: FSMContext)
     user_id = callback_query.from_user.id
 
     # Получаем ID записи в плане питания для замены
-    plan_entries = get_meal_plan_for_type(user_id, meal_type, date)
-    plan_entry_to_replace = None
-
-    for entry in plan_entries:
-        if entry['recipe_id'] == old_recipe_id:
-            plan_entry_to_replace = entry
-            break
+    plan_entry_id = await db_call(find_meal_plan_entry, user_id, date, meal_type, old_recipe_id)
 
-    if plan_entry_to_replace:
+    if plan_entry_id:
         # Удаляем старую запись
-        remove_from_meal_plan(plan_entry_to_replace['id'])
+        await db_call(remove_from_meal_plan, plan_entry_id)
 
         # Добавляем новую
-        add_to_meal_plan(user_id, new_recipe_id, meal_type, date)
-
-        new_recipe = get_recipe_details(new_recipe_id)
-        await callback_query.message.answer(
-            f"✅ Блюдо заменено на {new_recipe['name']}!"
+        await db_call(add_to_meal_plan, user_id, new_recipe_id, meal_type, date)
+
+        # Обновленный план уже содержит название нового блюда — берем его оттуда,
+        # не запрашивая рецепт отдельно, и передаем план для отображения
+        daily_plan = await db_call(get_daily_meal_plan, user_id, date)
+        new_name = next(
+            (entry['name'] for entry in daily_plan
+             if entry['recipe_id'] == new_recipe_id and entry['meal_type'] == meal_type),
+            None
         )
+        notice = f"✅ Блюдо заменено на {new_name}!" if new_name else "✅ Блюдо заменено!"
 
-        # Показываем обновленный план
-        await show_daily_plan(callback_query.message, state, date)
+        # Показываем обновленный план вместо сообщения с вариантами замены
+        await show_daily_plan(
+            callback_query.message, state, date, daily_plan=daily_plan, edit=True, notice=notice,
+            user_id=callback_query.from_user.id
+        )
     else:
         await callback_query.message.answer("❌ Ошибка при замене блюда")
 
-    await callback_query.answer()
-
 
 async def save_whole_plan_to_diary(callback_query: CallbackQuery, state: FSMContext):
     """Сохраняет весь сгенерированный рацион в дневник."""
+    await callback_query.answer()
+
     try:
         date = callback_query.data.split(':')[1]
         user_id = callback_query.from_user.id
 
         # Получаем план питания на указанную дату
-        daily_plan = get_daily_meal_plan(user_id, date)
+        daily_plan = await db_call(get_daily_meal_plan, user_id, date)
 
         if not daily_plan:
             await callback_query.message.edit_text("План питания на этот день пуст.")
-            await callback_query.answer()
             return
 
-        # Переносим каждое блюдо в дневник
-        added_count = 0
-        for entry in daily_plan:
-            # Получаем детали рецепта
-            recipe = get_recipe_details(entry.get('recipe_id'))
-
-            if recipe:
-                # Добавляем запись в дневник питания
-                success = add_food_entry(
-                    user_id,
-                    date,
-                    entry['meal_type'],
-                    recipe['name'],
-                    recipe['calories'],
-                    recipe['protein'],
-                    recipe['fat'],
-                    recipe['carbs']
-                )
-                if success:
-                    added_count += 1
+        # Переносим все блюда в дневник
+        added_count = await _copy_plan_to_diary(user_id, date, daily_plan)
 
         if added_count > 0:
             await callback_query.message.edit_text(
@@ -1120,11 +1263,11 @@ async def save_whole_plan_to_diary(callback_query: CallbackQuery, state: FSMCont
             "❌ Произошла ошибка при сохранении рациона в дневник."
         )
 
-    await callback_query.answer()
-
 
 async def show_plan_for_date(callback_query: CallbackQuery, state: FSMContext):
     """Показывает план питания для указанной даты."""
+    await callback_query.answer()
+
     try:
         date = callback_query.data.split(':')[1]
         
@@ -1132,19 +1275,14 @@ async def show_plan_for_date(callback_query: CallbackQuery, state: FSMContext):
         await state.update_data(selected_date=date)
         
         # Удаляем текущее сообщение и показываем план питания
-        try:
+        with suppress(TelegramBadRequest):
             await callback_query.message.delete()
-        except:
-            pass  # Игнорируем ошибки удаления
-            
-        await show_daily_plan(callback_query.message, state, date)
+
+        await show_daily_plan(callback_query.message, state, date, user_id=callback_query.from_user.id)
         
     except Exception as e:
         logger.error(f"Ошибка при показе плана: {e}")
-        await callback_query.answer("❌ Ошибка при показе плана")
-        return
-        
-    await callback_query.answer()
+        await callback_query.message.answer("❌ Ошибка при показе плана")
 
 
 async def handle_save_plan_to_diary(callback_query: CallbackQuery, state: FSMContext):
@@ -1156,38 +1294,20 @@ async def handle_save_plan_to_diary(callback_query: CallbackQuery, state: FSMCon
         else:
             # Если дата не передана, используем текущую из состояния
             user_data = await state.get_data()
-            date = user_data.get('selected_date', datetime.now().strftime("%Y-%m-%d"))
+            date = user_data.get('selected_date', today_str())
         
         user_id = callback_query.from_user.id
 
         # Получаем план питания на указанную дату
-        daily_plan = get_daily_meal_plan(user_id, date)
+        daily_plan = await db_call(get_daily_meal_plan, user_id, date)
 
         if not daily_plan:
             await callback_query.message.answer("План питания на этот день пуст.")
             await callback_query.answer()
             return
 
-        # Переносим каждое блюдо в дневник
-        added_count = 0
-        for entry in daily_plan:
-            # Получаем детали рецепта
-            recipe = get_recipe_details(entry.get('recipe_id'))
-
-            if recipe:
-                # Добавляем запись в дневник питания
-                success = add_food_entry(
-                    user_id,
-                    date,
-                    entry['meal_type'],
-                    recipe['name'],
-                    recipe['calories'],
-                    recipe['protein'],
-                    recipe['fat'],
-                    recipe['carbs']
-                )
-                if success:
-                    added_count += 1
+        # Переносим все блюда в дневник
+        added_count = await _copy_plan_to_diary(user_id, date, daily_plan)
 
         if added_count > 0:
             await callback_query.message.answer(
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageCaption, EditMessageReplyMarkup, EditMessageText
+from aiogram.types import CallbackQuery
+
+from utils import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Отбрасывает повторные нажатия одной и той же кнопки пользователем в пределах короткого окна.
+
+    Ключом служит пара (id пользователя, callback_data целиком), поэтому серия нажатий
+    одной кнопки «🔄 Заменить» дает одну обработку, а другие кнопки (в том числе с тем же
+    префиксом, например recipe:search и recipe:back) не блокируются.
+
+    Args:
+        rate (float): Длительность окна в секундах
+    """
+
+    def __init__(self, rate=0.4):
+        self._recent = TTLCache(maxsize=10000, ttl=rate)
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any]
+    ) -> Any:
+        key = (event.from_user.id, event.data)
+        if self._recent.get(key) is not None:
+            logger.debug(f"Повторное нажатие {key} отброшено")
+            await event.answer("⏳")
+            return None
+
+        self._recent.set(key, True)
+        return await handler(event, data)
+
+
+class RateLimiter:
+    """
+    Асинхронный ограничитель частоты: выпускает не больше rate операций в секунду,
+    равномерно распределяя их во времени.
+
+    Args:
+        rate (float): Допустимое количество операций в секунду
+    """
+
+    def __init__(self, rate=28):
+        self._interval = 1 / rate
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+# Под лимит Telegram на сообщения попадают только отправка и редактирование сообщений
+# (SendMessage, SendPhoto, EditMessageText, CopyMessage, ...); getUpdates,
+# answerCallbackQuery и прочие служебные методы идут без очереди
+_LIMITED_METHOD_PREFIXES = ("Send", "Edit", "Copy", "Forward")
+
+# Методы редактирования, у которых более новый запрос к тому же сообщению делает старый ненужным
+_COALESCED_EDITS = (EditMessageText, EditMessageReplyMarkup, EditMessageCaption)
+
+
+class RequestRateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Ограничивает частоту отправки и редактирования сообщений через Telegram Bot API (~30 сообщений
+    в секунду на бота) и повторяет запрос после паузы, если Telegram все же ответил RetryAfter.
+    Остальные методы (getUpdates, answerCallbackQuery и т. п.) не ждут в общей очереди.
+
+    Редактирования одного и того же сообщения схлопываются: если пока запрос ждал своей очереди,
+    пришло более новое редактирование того же типа, устаревшее не отправляется, а вызывающий код
+    получает результат нового (тот же отредактированный Message).
+
+    Args:
+        rate (float): Допустимое количество запросов в секунду
+        max_retries (int): Сколько раз повторять запрос после RetryAfter
+    """
+
+    def __init__(self, rate=28, max_retries=3):
+        self._limiter = RateLimiter(rate)
+        self._max_retries = max_retries
+        # (тип метода, chat_id, message_id) -> последнее поставленное в очередь редактирование
+        self._latest_edits = {}
+        # (тип метода, chat_id, message_id) -> future отброшенных редактирований, ждущих результат последнего
+        self._edit_waiters = {}
+
+    async def __call__(self, make_request, bot, method):
+        if not type(method).__name__.startswith(_LIMITED_METHOD_PREFIXES):
+            return await make_request(bot, method)
+
+        key = None
+        if isinstance(method, _COALESCED_EDITS) and method.message_id is not None:
+            key = (type(method), method.chat_id, method.message_id)
+            self._latest_edits[key] = method
+
+        try:
+            result = await self._send(make_request, bot, method, key)
+        except BaseException as e:
+            self._finish_edit(key, method, exception=e)
+            raise
+        self._finish_edit(key, method, result=result)
+        return result
+
+    def _finish_edit(self, key, method, result=None, exception=None):
+        """Если method — последнее редактирование сообщения, передает его результат отброшенным."""
+        if key is None or self._latest_edits.get(key) is not method:
+            return
+
+        del self._latest_edits[key]
+        for waiter in self._edit_waiters.pop(key, ()):
+            if waiter.done():
+                continue
+            if exception is None:
+                waiter.set_result(result)
+            elif isinstance(exception, asyncio.CancelledError):
+                waiter.cancel()
+            else:
+                waiter.set_exception(exception)
+
+    async def _send(self, make_request, bot, method, key):
+        for attempt in range(self._max_retries + 1):
+            async with self._limiter:
+                latest = self._latest_edits.get(key) if key is not None else None
+                if latest is not None and latest is not method:
+                    logger.debug(f"Устаревшее редактирование {key[1]}:{key[2]} отброшено")
+                    # Ждем результат более нового редактирования того же сообщения
+                    waiter = asyncio.get_running_loop().create_future()
+                    self._edit_waiters.setdefault(key, []).append(waiter)
+                    return await waiter
+                try:
+                    return await make_request(bot, method)
+                except TelegramRetryAfter as e:
+                    if attempt == self._max_retries:
+                        raise
+                    logger.warning(f"Превышен лимит запросов Telegram, повтор через {e.retry_after} с")
+                    retry_after = e.retry_after
+            await asyncio.sleep(retry_after)
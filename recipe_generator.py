@@ -1,26 +1,228 @@
 import asyncio
+import json
 import logging
-import random
-from aiogram import types, F, Dispatcher
-from aiogram.filters import Command
+import re
+from functools import lru_cache, wraps
+from aiogram import types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery
-from datetime import datetime
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
-from aiogram import Router
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.types import Message
 from typing import Union
 from database import (
-    save_recipe, get_saved_recipes, get_recipe_details, toggle_favorite_recipe,
-    delete_recipe, add_food_entry, get_user, get_db_connection, search_recipes
+    save_recipe, get_recipe_details, toggle_favorite_recipe,
+    delete_recipe, add_food_entry, search_recipes_page, db_call,
+    get_saved_recipes_page, get_saved_recipes_summary, prefetch_recipe_details
 )
-from keyboards import create_recipes_keyboard, create_recipe_confirmation_keyboard
-from food_api import search_food, get_food_nutrients, get_branded_food_info
+from keyboards import create_recipes_keyboard, create_recipe_confirmation_keyboard, after_calories_keyboard
+from config import MEAL_TYPES
+from utils import today_str, TTLCache
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# callback_data вида "действие:recipe_id[:параметр]"
+_CB_RE = re.compile(r'^([^:]+):(\d+)(?::(.+))?$')
+
+# Фоновые задачи (запись в БД после ответа на callback); ссылки не дают сборщику мусора удалить задачу
+_background_tasks = set()
+
+# ID callback-запросов, на которые уже отправлен ответ (Telegram принимает только один)
+_answered_callbacks = TTLCache(maxsize=10000, ttl=60)
+
+# Количество рецептов на странице результатов поиска и избранного
+_SEARCH_PAGE_SIZE = 5
+_FAVORITES_PAGE_SIZE = 5
+
+# Telegram не показывает клавиатуры больше ~100 кнопок, поэтому список рецептов выводится порциями
+_SAVED_LIST_LIMIT = 50
+
+# Неотрицательное число (до 6 цифр) с необязательной дробной частью до 3 цифр через точку или запятую
+_NUM_RE = re.compile(r'^\d{1,6}(?:[.,]\d{1,3})?$')
+
+# Ввод длиннее этого заведомо не число из _NUM_RE (с запасом на пробелы); отсекается без разбора
+_NUM_MAX_INPUT_LEN = 32
+
+# Кнопка возврата, общая для списков сохраненных и избранных рецептов
+_BACK_TO_RECIPES_ROW = [types.InlineKeyboardButton(text="◀️ Назад к меню рецептов", callback_data="return_to_recipes")]
+
+# Нижние кнопки страниц поиска и избранного
+_BACK_TO_SEARCH_ROW = [InlineKeyboardButton(text="◀️ Назад к поиску", callback_data="recipe:search")]
+_BACK_TO_RECIPE_MENU_ROW = [InlineKeyboardButton(text="◀️ Назад в меню рецептов", callback_data="recipe:back")]
+
+# Кнопки возврата из карточек рецептов к результатам поиска и к избранному
+_BACK_TO_SEARCH_RESULTS_ROW = [InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_search")]
+_BACK_TO_FAVORITES_ROW = [InlineKeyboardButton(text="◀️ Назад к избранному", callback_data="back_to_favorites")]
+
+# Клавиатура из одной кнопки возврата в меню рецептов; неизменяемая, поэтому создается один раз
+_BACK_MARKUP = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="◀️ Назад", callback_data="recipe:back")]
+])
+
+# Таблица замены запятых на переводы строк для ингредиентов старых рецептов (без ingredients_json)
+_ING_TRANS = str.maketrans({",": "\n"})
+
+# Шаблон карточки рецепта; icon и per различаются у обычной и избранной карточки
+_DETAILS_TMPL = (
+    "{icon} <b>{name}</b>\n\n"
+    "<b>Ингредиенты:</b>\n"
+    "{ingredients}\n\n"
+    "<b>Способ приготовления:</b>\n"
+    "{instructions}\n\n"
+    "<b>Пищевая ценность{per}:</b>\n"
+    "• Калории: {calories} ккал\n"
+    "• Белки: {protein} г\n"
+    "• Жиры: {fat} г\n"
+    "• Углеводы: {carbs} г"
+)
+
+# Шаблон подтверждения данных рецепта; header — заголовок над данными
+_CONFIRM_TMPL = (
+    "{header}\n\n"
+    "<b>Название:</b> {name}\n\n"
+    "<b>Ингредиенты:</b>\n{ingredients}\n\n"
+    "<b>Способ приготовления:</b>\n{instructions}\n\n"
+    "<b>Пищевая ценность:</b>\n"
+    "• Калории: {calories} ккал\n"
+    "• Белки: {protein} г\n"
+    "• Жиры: {fat} г\n"
+    "• Углеводы: {carbs} г\n\n"
+    "Всё правильно?"
+)
+
+
+def _run_in_background(coro):
+    """Запускает корутину фоновой задачей, сохраняя ссылку на нее до завершения."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _answer(callback_query, text=None):
+    """
+    Отвечает на callback-запрос не более одного раза.
+
+    Если ответ уже отправлен (например, декоратором ack_first), текст уведомления
+    приходит обычным сообщением, а пустой повторный ответ пропускается.
+    """
+    if _answered_callbacks.get(callback_query.id) is None:
+        _answered_callbacks.set(callback_query.id, True)
+        await callback_query.answer(text)
+    elif text:
+        await callback_query.message.answer(text)
+
+
+def ack_first(handler):
+    """
+    Декоратор: отвечает на callback-запрос сразу при входе в обработчик, до работы с БД,
+    чтобы Telegram убрал индикатор загрузки с кнопки. Ошибка ответа (например, истекший
+    запрос) только логируется. Сообщения об ошибках такие обработчики отправляют в чат.
+    """
+    @wraps(handler)
+    async def wrapper(callback_query, *args, **kwargs):
+        try:
+            await _answer(callback_query)
+        except Exception as e:
+            logger.warning(f"Не удалось ответить на callback-запрос {callback_query.id}: {e}")
+        return await handler(callback_query, *args, **kwargs)
+
+    return wrapper
+
+
+@lru_cache(maxsize=1024)
+def _recipe_button(action, recipe_id, label):
+    """Кнопка рецепта в списке; одинаковые кнопки при листании страниц переиспользуются."""
+    return InlineKeyboardButton(text=label, callback_data=f"{action}:{recipe_id}")
+
+
+def _with_favorite_button(markup, recipe_id, is_favorite):
+    """
+    Возвращает клавиатуру карточки, в которой кнопка избранного соответствует новому статусу,
+    или None, если менять нечего. Остальные кнопки (в том числе «Назад») сохраняются как есть.
+    """
+    if markup is None:
+        return None
+
+    callback_data = f"toggle_fav:{recipe_id}"
+    button = _recipe_button("toggle_fav", recipe_id, "💔 Удалить из избранного" if is_favorite else "❤️ В избранное")
+    rows = [
+        [button if old.callback_data == callback_data else old for old in row]
+        for row in markup.inline_keyboard
+    ]
+    if rows == markup.inline_keyboard:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+@lru_cache(maxsize=512)
+def _pagination_row(cb_prefix, page, has_next, label):
+    """
+    Строка кнопок пагинации. Для одинаковых параметров возвращает один и тот же кортеж кнопок.
+
+    Args:
+        cb_prefix (str): Префикс callback_data, к которому добавляется номер страницы
+        page (int): Номер текущей страницы (с нуля)
+        has_next (bool): Есть ли следующая страница
+        label (str): Подпись центральной кнопки
+    """
+    row = []
+    if page > 0:
+        row.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"{cb_prefix}:{page - 1}"))
+    row.append(InlineKeyboardButton(text=label, callback_data="noop"))
+    if has_next:
+        row.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=f"{cb_prefix}:{page + 1}"))
+    return tuple(row)
+
+
+@lru_cache(maxsize=256)
+def _meal_type_keyboard(recipe_id):
+    """Клавиатура выбора приема пищи для рецепта; собирается один раз на каждый recipe_id."""
+    keyboard = [
+        [types.InlineKeyboardButton(text=meal_type, callback_data=f"add_recipe_to_meal:{recipe_id}:{meal_type}")]
+        for meal_type in MEAL_TYPES
+    ]
+    keyboard.append([types.InlineKeyboardButton(text="◀️ Отмена", callback_data=f"view_recipe:{recipe_id}")])
+    return types.InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def _parse_recipe_callback(data):
+    """Разбирает callback_data вида 'действие:recipe_id[:параметр]'. Возвращает (recipe_id, параметр или None)."""
+    match = _CB_RE.match(data)
+    return int(match.group(2)), match.group(3)
+
+
+def _parse_nonneg_float(text):
+    """Преобразует ввод пользователя в неотрицательное число. Возвращает None, если ввод некорректен."""
+    if not text or len(text) > _NUM_MAX_INPUT_LEN:
+        return None
+    text = text.strip()
+    if not _NUM_RE.match(text):
+        return None
+    return float(text.replace(',', '.'))
+
+
+def _format_confirmation(data, header="<b>Проверьте данные рецепта:</b>"):
+    """Формирует текст подтверждения данных рецепта перед сохранением."""
+    return _CONFIRM_TMPL.format_map({**data, 'header': header})
+
+
+def _ingredients_text(recipe):
+    """Ингредиенты по одному на строку: из ingredients_json, а для старых рецептов — из текста через запятую."""
+    if recipe.get('ingredients_json'):
+        return "\n".join(json.loads(recipe['ingredients_json']))
+    return recipe['ingredients'].translate(_ING_TRANS)
+
+
+def _format_recipe_details(recipe, icon="🍳", per=""):
+    """Формирует текст карточки рецепта по шаблону; ингредиенты выводятся по одному на строку."""
+    return _DETAILS_TMPL.format_map({
+        **recipe,
+        'icon': icon,
+        'per': per,
+        'ingredients': _ingredients_text(recipe)
+    })
+
 
 # Состояния для создания и выбора рецептов
 class RecipeStates(StatesGroup):
@@ -51,43 +253,13 @@ async def show_recipes_menu(message: types.Message, state: FSMContext):
                          reply_markup=keyboard)
 
 
-async def handle_recipes_callback(callback_query: CallbackQuery, state: FSMContext):
-    """Обрабатывает нажатия на кнопки меню рецептов."""
-    action = callback_query.data.split(':')[1]
-
-    if action == "search":
-        await search_recipes(callback_query, state)
-    elif action == "favorites":
-        await show_favorites(callback_query, state)
-    elif action == "create":
-        await start_recipe_creation(callback_query, state)
-    elif action == "generate":
-        await generate_recipe(callback_query)
-    elif action == "back":
-        await return_to_main_menu(callback_query)
-    await callback_query.answer()
-
-
-'''async def search_recipes(callback_query: CallbackQuery, state: FSMContext):
-    """Запрашиваем текст для поиска"""
-    await callback_query.message.edit_text(
-        "🔍 Введите название или ингредиенты для поиска:",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="◀️ Назад", callback_data="recipe:back")]
-        ]))
-    await state.set_state(RecipeStates.searching)
-    await callback_query.answer()'''
-
-
 async def search_recipes(callback_query: CallbackQuery, state: FSMContext):
     """Запрашиваем текст для поиска"""
     await callback_query.message.edit_text(
         "🔍 Введите название или ингредиенты для поиска:",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="◀️ Назад", callback_data="recipe:back")]
-        ]))
+        reply_markup=_BACK_MARKUP)
     await state.set_state(RecipeStates.searching)
-    await callback_query.answer()
+    await _answer(callback_query)
 
 
 # @router.message(RecipeStates.searching)
@@ -101,45 +273,57 @@ async def process_search_query(message: Message, state: FSMContext):
     search_query = ' '.join(search_query.split())
 
     user_id = message.from_user.id
-    from database import search_recipes
-    recipes = search_recipes(user_id, search_query)
+    recipes = await db_call(search_recipes_page, user_id, search_query, limit=_SEARCH_PAGE_SIZE + 1)
 
     if not recipes:
         await message.answer("😕 Ничего не найдено. Попробуйте другой запрос.")
         await state.clear()
         return
 
-    # Сохраняем результаты поиска в состоянии
+    # В состоянии храним только запрос и курсоры уже открытых страниц, а не сами результаты
     await state.update_data(
-        search_results=recipes,
+        search_cursors=[None],
         current_page=0,
         search_query=search_query
     )
 
     # Показываем первую страницу результатов
-    await show_search_results(message, state)
+    await show_search_results(message, state, recipes=recipes)
+
 
+async def show_search_results(message: Union[Message, CallbackQuery], state: FSMContext, page=0, recipes=None,
+                              markup_only=False):
+    """
+    Показываем страницу с результатами поиска.
 
-async def show_search_results(message: Union[Message, CallbackQuery], state: FSMContext, page=0):
-    """Показываем страницу с результатами поиска"""
+    Текст сообщения зависит только от запроса, а рецепты страницы выводятся кнопками,
+    поэтому при листании (markup_only=True) достаточно заменить клавиатуру.
+    """
     data = await state.get_data()
-    recipes = data.get('search_results', [])
     search_query = data.get('search_query', '')
+    cursors = data.get('search_cursors', [None])
 
-    # Пагинация - разбиваем на страницы по 5 рецептов
-    page_size = 5
-    total_pages = (len(recipes) // page_size + (1 if len(recipes) % page_size else 0))
+    # Курсор известен только для уже открытых страниц и следующей за ними
+    page = max(0, min(page, len(cursors) - 1))
 
-    if page >= total_pages:
-        page = total_pages - 1
+    # Запрашиваем на одну строку больше страницы: лишняя строка означает, что есть следующая
+    if recipes is None:
+        recipes = await db_call(
+            search_recipes_page, message.from_user.id, search_query, cursors[page], _SEARCH_PAGE_SIZE + 1
+        )
+    page_recipes = recipes[:_SEARCH_PAGE_SIZE]
+    has_next = len(recipes) > _SEARCH_PAGE_SIZE
 
-    start_idx = page * page_size
-    page_recipes = recipes[start_idx:start_idx + page_size]
+    # Карточки видимых рецептов подгружаются в кэш одним запросом, пока пользователь выбирает
+    _run_in_background(db_call(prefetch_recipe_details, [recipe['id'] for recipe in page_recipes]))
 
-    # Формируем текст сообщения
-    text = f"🔍 Результаты поиска по запросу '{search_query}':\n\n"
-    for i, recipe in enumerate(page_recipes, 1):
-        text += f"{i}. {recipe['name']} ({recipe['calories']} ккал)\n"
+    if has_next and len(cursors) == page + 1:
+        last = page_recipes[-1]
+        cursors.append([last['score'], last['id']])
+        await state.update_data(search_cursors=cursors)
+
+    # Текст сообщения одинаков для всех страниц
+    text = f"🔍 Результаты поиска по запросу '{search_query}':"
 
     # Создаем клавиатуру
     keyboard = []
@@ -147,54 +331,27 @@ async def show_search_results(message: Union[Message, CallbackQuery], state: FSM
     # Кнопки для рецептов
     for recipe in page_recipes:
         keyboard.append([
-            InlineKeyboardButton(
-                text=recipe['name'],
-                callback_data=f"view_recipe:{recipe['id']}"
-            )
+            _recipe_button("view_recipe", recipe['id'], f"{recipe['name']} ({recipe['calories']} ккал)")
         ])
 
-        # Кнопки пагинации
-    pagination_row = []
-    if total_pages > 1:
-        if page > 0:
-            pagination_row.append(
-                InlineKeyboardButton(
-                    text="⬅️ Назад",
-                    callback_data=f"search_page:{page - 1}"
-                )
-            )
-
-        pagination_row.append(
-            InlineKeyboardButton(
-                text=f"{page + 1}/{total_pages}",
-                callback_data="noop"
-            )
-        )
-
-        if page < total_pages - 1:
-            pagination_row.append(
-                InlineKeyboardButton(
-                    text="Вперед ➡️",
-                    callback_data=f"search_page:{page + 1}"
-                )
-            )
-
-        keyboard.append(pagination_row)
+    # Кнопки пагинации
+    if page > 0 or has_next:
+        keyboard.append(list(_pagination_row("search_page", page, has_next, f"Стр. {page + 1}")))
 
     # Кнопка возврата
-    keyboard.append([
-        InlineKeyboardButton(
-            text="◀️ Назад к поиску",
-            callback_data="recipe:search"
-        )
-    ])
+    keyboard.append(_BACK_TO_SEARCH_ROW)
 
     if isinstance(message, CallbackQuery):
-        await message.message.edit_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
-        )
-        await message.answer()
+        if markup_only:
+            await message.message.edit_reply_markup(
+                reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
+            )
+        else:
+            await message.message.edit_text(
+                text,
+                reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
+            )
+        await _answer(message)
     else:
         await message.answer(
             text,
@@ -203,185 +360,98 @@ async def show_search_results(message: Union[Message, CallbackQuery], state: FSM
 
 
 # @router.callback_query(F.data.startswith("search_page:"))
+@ack_first
 async def handle_search_page(callback_query: CallbackQuery, state: FSMContext):
     """Обрабатываем переключение страниц поиска"""
-    page = int(callback_query.data.split(":")[1])
+    page, _ = _parse_recipe_callback(callback_query.data)
     await state.update_data(current_page=page)
-    await show_search_results(callback_query, state, page)
-
-
-async def view_recipe_card(callback_query: CallbackQuery, recipe_id: int):
-    """Показываем карточку рецепта"""
-    recipe = get_recipe_details(recipe_id)
-    if not recipe:
-        await callback_query.answer("Рецепт не найден")
-        return
-
-    # Формируем текст карточки
-    text = f"🍳 <b>{recipe['name']}</b>\n\n"
-    text += "<b>Ингредиенты:</b>\n"
-    text += recipe['ingredients'].replace(",", "\n") + "\n\n"
-    text += "<b>Способ приготовления:</b>\n"
-    text += recipe['instructions'] + "\n\n"
-    text += "<b>Пищевая ценность (на 100г):</b>\n"
-    text += f"• Калории: {recipe['calories']} ккал\n"
-    text += f"• Белки: {recipe['protein']} г\n"
-    text += f"• Жиры: {recipe['fat']} г\n"
-    text += f"• Углеводы: {recipe['carbs']} г"
-
-    # Клавиатура карточки
-    keyboard = [
-        [
-            InlineKeyboardButton(text="❤️ В избранное", callback_data=f"toggle_fav:{recipe_id}"),
-            InlineKeyboardButton(text="➕ В меню", callback_data=f"add_to_menu:{recipe_id}")
-        ],
-        [InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_search")]
-    ]
-
-    # Если есть фото (добавьте поле photo_path в таблицу recipes)
-    if recipe.get('photo_path'):
-        await callback_query.message.answer_photo(
-            photo=recipe['photo_path'],
-            caption=text,
-            parse_mode="HTML",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
-        )
-    else:
-        await callback_query.message.edit_text(
-            text,
-            parse_mode="HTML",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
-        )
-
-    await callback_query.answer()
+    await show_search_results(callback_query, state, page, markup_only=True)
 
 
 async def show_favorites(callback_query: CallbackQuery, state: FSMContext):
     user_id = callback_query.from_user.id
-    from database import get_saved_recipes
-    favorites = get_saved_recipes(user_id, is_favorite=True)  # Функция из database.py
-
-    '''if not favorites:
-        text = "У вас пока нет избранных рецептов."
-    else:
-        text = "⭐ Ваши избранные рецепты:\n\n"
-        for recipe in favorites:
-            text += f"- {recipe['name']} ({recipe['calories']} ккал)\n"'''
+    # Первая страница избранного; общее количество приходит в той же выборке (total_count)
+    favorites = await db_call(
+        get_saved_recipes_page, user_id, 0, _FAVORITES_PAGE_SIZE, is_favorite=True
+    )
 
     if not favorites:
         await callback_query.message.edit_text(
             "У вас пока нет избранных рецептов.",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="◀️ Назад", callback_data="recipe:back")]
-            ]))
-        await callback_query.answer()
+            reply_markup=_BACK_MARKUP)
+        await _answer(callback_query)
         return
 
-        # Сохраняем список избранного в состоянии
-    await state.update_data(favorites_list=favorites, current_fav_page=0)
+    # В состоянии храним только номер страницы, а не список избранного
+    await state.update_data(current_fav_page=0)
 
     # Формируем сообщение с пагинацией
-    await show_favorites_page(callback_query, state)
-
-    '''await callback_query.message.edit_text(
-        text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="◀️ Назад", callback_data="recipes:back")]
-        ])
-    )'''
+    await show_favorites_page(callback_query, state, favorites=favorites)
 
 
-async def show_favorites_page(callback_query: CallbackQuery, state: FSMContext, page=0):
+async def show_favorites_page(callback_query: CallbackQuery, state: FSMContext, page=0, favorites=None):
     """Показывает страницу с избранными рецептами"""
-    data = await state.get_data()
-    favorites = data.get('favorites_list', [])
-
-    # Пагинация
-    page_size = 5
-    total_pages = (len(favorites) // page_size + (1 if len(favorites) % page_size else 0))
-    page = min(page, total_pages - 1) if total_pages > 0 else 0
-    start_idx = page * page_size
-    page_favorites = favorites[start_idx:start_idx + page_size]
-
-    text = "⭐ Ваши избранные рецепты:\n\n"
-    for i, recipe in enumerate(page_favorites, start_idx + 1):
-        text += f"{i}. {recipe['name']} ({recipe['calories']} ккал)\n"
+    if favorites is None:
+        favorites = await db_call(
+            get_saved_recipes_page, callback_query.from_user.id,
+            page * _FAVORITES_PAGE_SIZE, _FAVORITES_PAGE_SIZE, is_favorite=True
+        )
+        # Страница могла опустеть после удаления из избранного — возвращаемся к первой
+        if not favorites and page > 0:
+            return await show_favorites_page(callback_query, state)
+    page_favorites = favorites
+    total = favorites[0]['total_count'] if favorites else 0
+
+    # Карточки видимых рецептов подгружаются в кэш одним запросом, пока пользователь выбирает
+    _run_in_background(db_call(prefetch_recipe_details, [recipe['id'] for recipe in page_favorites]))
+    total_pages = -(-total // _FAVORITES_PAGE_SIZE)
+    start_idx = page * _FAVORITES_PAGE_SIZE
+
+    text = "⭐ Ваши избранные рецепты:\n\n" + "".join(
+        f"{i}. {recipe['name']} ({recipe['calories']} ккал)\n"
+        for i, recipe in enumerate(page_favorites, start_idx + 1)
+    )
 
     # Клавиатура с рецептами и пагинацией
     keyboard = []
     for recipe in page_favorites:
-        keyboard.append([InlineKeyboardButton(
-            text=recipe['name'],
-            callback_data=f"view_fav_recipe:{recipe['id']}"
-        )])
+        keyboard.append([_recipe_button("view_fav_recipe", recipe['id'], recipe['name'])])
 
     # Пагинация
-    pagination_row = []
     if total_pages > 1:
-        if page > 0:
-            pagination_row.append(InlineKeyboardButton(
-                text="⬅️ Назад",
-                callback_data=f"fav_page:{page - 1}"
-            ))
-
-        # Добавляем номер страницы в любом случае
-        pagination_row.append(InlineKeyboardButton(
-            text=f"{page + 1}/{total_pages}",
-            callback_data="noop"
-        ))
-
-        if page < total_pages - 1:
-            pagination_row.append(InlineKeyboardButton(
-                text="Вперед ➡️",
-                callback_data=f"fav_page:{page + 1}"
-            ))
-    if pagination_row:
-        keyboard.append(pagination_row)
+        keyboard.append(list(_pagination_row(
+            "fav_page", page, page < total_pages - 1, f"{page + 1}/{total_pages}"
+        )))
 
     # Кнопка возврата
-    keyboard.append([InlineKeyboardButton(
-        text="◀️ Назад в меню рецептов",
-        callback_data="recipe:back"
-    )])
+    keyboard.append(_BACK_TO_RECIPE_MENU_ROW)
 
     await callback_query.message.edit_text(
         text,
         reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
-    await callback_query.answer()
+    await _answer(callback_query)
 
 
-
-async def start_recipe_creation(callback_query: CallbackQuery, state: FSMContext):
-    """Начинает процесс создания рецепта."""
-    await state.clear()
-
-    await callback_query.message.answer(
-        "Давайте создадим новый рецепт! Введите название рецепта:"
-    )
-    await state.set_state(RecipeStates.entering_name)
-
+@ack_first
+async def handle_favorites_page(callback_query: CallbackQuery, state: FSMContext):
+    """Обрабатывает переключение страниц избранного"""
+    page, _ = _parse_recipe_callback(callback_query.data)
+    await state.update_data(current_fav_page=page)
+    await show_favorites_page(callback_query, state, page)
 
 
+@ack_first
 async def view_favorite_recipe(callback_query: CallbackQuery, state: FSMContext):
     """Показывает карточку избранного рецепта"""
-    recipe_id = int(callback_query.data.split(':')[1])
-    recipe = get_recipe_details(recipe_id)
+    recipe_id, _ = _parse_recipe_callback(callback_query.data)
+    recipe = await db_call(get_recipe_details, recipe_id)
 
     if not recipe:
-        await callback_query.answer("Рецепт не найден")
+        await callback_query.message.answer("Рецепт не найден")
         return
 
     # Формируем текст карточки
-    text = f"⭐️🍳 <b>{recipe['name']}</b>\n\n"
-    text += "<b>Ингредиенты:</b>\n"
-    text += recipe['ingredients'].replace(",", "\n") + "\n\n"
-    text += "<b>Способ приготовления:</b>\n"
-    text += recipe['instructions'] + "\n\n"
-    text += "<b>Пищевая ценность:</b>\n"
-    text += f"• Калории: {recipe['calories']} ккал\n"
-    text += f"• Белки: {recipe['protein']} г\n"
-    text += f"• Жиры: {recipe['fat']} г\n"
-    text += f"• Углеводы: {recipe['carbs']} г"
+    text = _format_recipe_details(recipe, icon="⭐️🍳")
 
     # Клавиатура карточки
     keyboard = [
@@ -389,135 +459,122 @@ async def view_favorite_recipe(callback_query: CallbackQuery, state: FSMContext)
             InlineKeyboardButton(text="💔 Удалить из избранного", callback_data=f"toggle_fav:{recipe_id}"),
             InlineKeyboardButton(text="➕ В меню", callback_data=f"add_to_menu:{recipe_id}")
         ],
-        [InlineKeyboardButton(text="◀️ Назад к избранному", callback_data="back_to_favorites")]
+        _BACK_TO_FAVORITES_ROW
     ]
 
     await callback_query.message.edit_text(
         text,
         parse_mode="HTML",
         reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
-    await callback_query.answer()
 
 
-async def generate_recipe(callback_query: types.CallbackQuery):
-    # Здесь будет код генерации рецепта
-    await callback_query.message.edit_text(
-        "🎲 Генерация рецепта...",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="◀️ Назад", callback_data="recipes:back")]
-        ])
-    )
-
-
-async def return_to_main_menu(callback_query: types.CallbackQuery):
-    from handlers import after_calories_keyboard
+async def return_to_main_menu(callback_query: types.CallbackQuery, state: FSMContext = None):
     await callback_query.message.delete()
     await callback_query.message.answer(
         "Вы вернулись в главное меню",
         reply_markup=after_calories_keyboard
     )
+    await _answer(callback_query)
 
 
-async def show_saved_recipes(callback_query: CallbackQuery, state: FSMContext):
-    """Показывает сохраненные рецепты пользователя."""
+async def show_saved_recipes(callback_query: CallbackQuery, state: FSMContext, offset=0):
+    """Показывает сохраненные рецепты пользователя (не больше _SAVED_LIST_LIMIT кнопок за раз)."""
     user_id = callback_query.from_user.id
-    recipes = get_saved_recipes(user_id)
+    # Лишняя строка показывает, что за пределами списка есть еще рецепты
+    recipes = await db_call(get_saved_recipes_page, user_id, offset, _SAVED_LIST_LIMIT + 1)
 
     if not recipes:
         await callback_query.message.answer(
             "У вас пока нет сохраненных рецептов. Вы можете создать новый или сгенерировать рецепт.")
-        await callback_query.answer()
+        await _answer(callback_query)
         return
 
     text = "📝 <b>Ваши рецепты:</b>\n\n"
 
-    # Создаем клавиатуру с рецептами
-    keyboard = []
-    for recipe in recipes:
-        recipe_name = recipe['name']
-        if len(recipe_name) > 30:
-            recipe_name = recipe_name[:27] + "..."
+    # Клавиатура с рецептами; укороченное название (display_name) вычисляется в SQL-запросе
+    keyboard = [
+        [_recipe_button(
+            "view_recipe", recipe['id'],
+            f"{'★' if recipe['is_favorite'] else '☆'} {recipe['display_name']} ({recipe['calories']} ккал)"
+        )]
+        for recipe in recipes[:_SAVED_LIST_LIMIT]
+    ]
 
+    if len(recipes) > _SAVED_LIST_LIMIT:
         keyboard.append([types.InlineKeyboardButton(
-            text=f"{'★' if recipe['is_favorite'] else '☆'} {recipe_name} ({recipe['calories']} ккал)",
-            callback_data=f"view_recipe:{recipe['id']}"
+            text="⬇️ Показать ещё",
+            callback_data=f"saved_page:{offset + _SAVED_LIST_LIMIT}"
         )])
 
     # Добавляем кнопку возврата
-    keyboard.append([types.InlineKeyboardButton(
-        text="◀️ Назад к меню рецептов",
-        callback_data="return_to_recipes"
-    )])
+    keyboard.append(_BACK_TO_RECIPES_ROW)
 
     await callback_query.message.answer(
         text=text,
         parse_mode="HTML",
         reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard)
     )
-    await callback_query.answer()
+    await _answer(callback_query)
+
+
+@ack_first
+async def handle_saved_recipes_page(callback_query: CallbackQuery, state: FSMContext):
+    """Показывает следующую порцию сохраненных рецептов"""
+    offset, _ = _parse_recipe_callback(callback_query.data)
+    await show_saved_recipes(callback_query, state, offset)
 
 
 async def show_favorite_recipes(callback_query: CallbackQuery, state: FSMContext):
     """Показывает избранные рецепты пользователя."""
     user_id = callback_query.from_user.id
-    recipes = get_saved_recipes(user_id, is_favorite=True)
+    recipes = await db_call(get_saved_recipes_summary, user_id, is_favorite=True)
 
     if not recipes:
         await callback_query.message.answer(
             "У вас пока нет избранных рецептов. Вы можете добавить рецепты в избранное.")
-        await callback_query.answer()
+        await _answer(callback_query)
         return
 
     text = "⭐️ <b>Ваши избранные рецепты:</b>\n\n"
 
     # Создаем клавиатуру с рецептами
     keyboard = []
+    # Укороченное название (display_name) вычисляется в SQL-запросе get_saved_recipes_summary
     for recipe in recipes:
-        recipe_name = recipe['name']
-        if len(recipe_name) > 30:
-            recipe_name = recipe_name[:27] + "..."
-
         keyboard.append([types.InlineKeyboardButton(
-            text=f"★ {recipe_name} ({recipe['calories']} ккал)",
+            text=f"★ {recipe['display_name']} ({recipe['calories']} ккал)",
             callback_data=f"view_recipe:{recipe['id']}"
         )])
 
     # Добавляем кнопку возврата
-    keyboard.append([types.InlineKeyboardButton(
-        text="◀️ Назад к меню рецептов",
-        callback_data="return_to_recipes"
-    )])
+    keyboard.append(_BACK_TO_RECIPES_ROW)
 
     await callback_query.message.answer(
         text=text,
         parse_mode="HTML",
         reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard)
     )
-    await callback_query.answer()
+    await _answer(callback_query)
+
 
+@ack_first
+async def view_recipe_details(callback_query: CallbackQuery, state: FSMContext, recipe=None):
+    """Показывает детальную информацию о рецепте.
 
-async def view_recipe_details(callback_query: CallbackQuery, state: FSMContext):
-    """Показывает детальную информацию о рецепте."""
+    Если рецепт уже загружен вызывающим кодом, его можно передать в recipe,
+    чтобы не читать его из базы данных повторно.
+    """
     try:
-        recipe_id = int(callback_query.data.split(':')[1])
-        from database import get_recipe_details  # Добавляем импорт
-        recipe = get_recipe_details(recipe_id)
+        recipe_id, _ = _parse_recipe_callback(callback_query.data)
+        if recipe is None:
+            recipe = await db_call(get_recipe_details, recipe_id)
 
         if not recipe:
-            await callback_query.answer("Рецепт не найден")
+            await callback_query.message.answer("Рецепт не найден")
             return
 
         # Формируем текст карточки
-        text = f"🍳 <b>{recipe['name']}</b>\n\n"
-        text += "<b>Ингредиенты:</b>\n"
-        text += recipe['ingredients'].replace(",", "\n") + "\n\n"
-        text += "<b>Способ приготовления:</b>\n"
-        text += recipe['instructions'] + "\n\n"
-        text += "<b>Пищевая ценность:</b>\n"
-        text += f"• Калории: {recipe['calories']} ккал\n"
-        text += f"• Белки: {recipe['protein']} г\n"
-        text += f"• Жиры: {recipe['fat']} г\n"
-        text += f"• Углеводы: {recipe['carbs']} г"
+        text = _format_recipe_details(recipe)
 
         # Клавиатура карточки
         keyboard = [
@@ -525,7 +582,7 @@ async def view_recipe_details(callback_query: CallbackQuery, state: FSMContext):
                 InlineKeyboardButton(text="❤️ В избранное", callback_data=f"toggle_fav:{recipe_id}"),
                 InlineKeyboardButton(text="➕ В меню", callback_data=f"add_to_menu:{recipe_id}")
             ],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_search")]
+            _BACK_TO_SEARCH_RESULTS_ROW
         ]
 
         # Удаляем предыдущее сообщение с результатами поиска
@@ -537,41 +594,44 @@ async def view_recipe_details(callback_query: CallbackQuery, state: FSMContext):
             parse_mode="HTML",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
         )
-        await callback_query.answer()
     except Exception as e:
         logger.error(f"Ошибка при отображении рецепта: {e}")
-        await callback_query.answer("Произошла ошибка при загрузке рецепта")
+        await callback_query.message.answer("Произошла ошибка при загрузке рецепта")
 
 
 async def toggle_favorite_handler(callback_query: CallbackQuery, state: FSMContext):
     """Обрабатывает добавление/удаление из избранного"""
-    recipe_id = int(callback_query.data.split(':')[1])
-    from database import toggle_favorite_recipe
+    recipe_id, _ = _parse_recipe_callback(callback_query.data)
 
-    new_status = toggle_favorite_recipe(recipe_id)
-    status_text = "добавлен в избранное" if new_status else "удален из избранного"
+    # Запись в БД выполняется вне цикла событий; текст ответа зависит от ее результата
+    recipe = await db_call(toggle_favorite_recipe, recipe_id)
+    status_text = "добавлен в избранное" if recipe and recipe['is_favorite'] else "удален из избранного"
 
-    await callback_query.answer(f"Рецепт {status_text}!")
-    # Обновляем сообщение с рецептом
-    await view_recipe_details(callback_query, callback_query.message.bot.current_state(callback_query.from_user.id))
-    await view_recipe_details(callback_query, state)
+    await _answer(callback_query, f"Рецепт {status_text}!")
+    if not recipe:
+        return
+
+    # Текст карточки от статуса избранного не зависит, поэтому меняется только подпись кнопки
+    markup = _with_favorite_button(callback_query.message.reply_markup, recipe_id, recipe['is_favorite'])
+    if markup is not None:
+        await callback_query.message.edit_reply_markup(reply_markup=markup)
 
 
 async def add_to_menu_handler(callback_query: CallbackQuery, state: FSMContext):
     """Обрабатывает добавление рецепта в меню на сегодня"""
-    recipe_id = int(callback_query.data.split(':')[1])
-    from database import get_recipe_details, add_food_entry
+    recipe_id, _ = _parse_recipe_callback(callback_query.data)
 
-    recipe = get_recipe_details(recipe_id)
+    recipe = await db_call(get_recipe_details, recipe_id)
     if not recipe:
-        await callback_query.answer("Рецепт не найден")
+        await _answer(callback_query, "Рецепт не найден")
         return
 
-    # Добавляем в дневник как отдельный прием пищи "Рецепт"
-    today = datetime.now().strftime("%Y-%m-%d")
-    add_food_entry(
+    # Запись в дневник как отдельный прием пищи "Рецепт" выполняется вне цикла событий;
+    # об успехе сообщаем только после того, как она прошла
+    entry_id = await db_call(
+        add_food_entry,
         user_id=callback_query.from_user.id,
-        date=today,
+        date=today_str(),
         meal_type="Рецепт",
         food_name=recipe['name'],
         calories=recipe['calories'],
@@ -579,37 +639,42 @@ async def add_to_menu_handler(callback_query: CallbackQuery, state: FSMContext):
         fat=recipe['fat'],
         carbs=recipe['carbs']
     )
+    if not entry_id:
+        await _answer(callback_query, "❌ Не удалось добавить рецепт в меню")
+        return
 
-    await callback_query.answer(f"Рецепт '{recipe['name']}' добавлен в сегодняшнее меню!")
+    await _answer(callback_query, f"Рецепт '{recipe['name']}' добавлен в сегодняшнее меню!")
 
 
 async def toggle_recipe_favorite_status(callback_query: CallbackQuery, state: FSMContext):
     """Меняет статус избранного рецепта."""
-    recipe_id = int(callback_query.data.split(':')[1])
-    new_status = toggle_favorite_recipe(recipe_id)
+    recipe_id, _ = _parse_recipe_callback(callback_query.data)
+    recipe = await db_call(toggle_favorite_recipe, recipe_id)
 
-    status_text = "добавлен в избранное" if new_status else "удален из избранного"
-    await callback_query.message.answer(f"Рецепт {status_text}!")
+    status_text = "добавлен в избранное" if recipe and recipe['is_favorite'] else "удален из избранного"
 
-    # Показываем обновленные детали рецепта
-    await view_recipe_details(callback_query, state)
-    await callback_query.answer()
+    # Сначала уведомление, затем обновленная карточка (из строки, которую вернул UPDATE)
+    await callback_query.message.answer(f"Рецепт {status_text}!")
+    await view_recipe_details(callback_query, state, recipe=recipe)
+    await _answer(callback_query)
 
 
+@ack_first
 async def delete_recipe_handler(callback_query: CallbackQuery, state: FSMContext):
     """Удаляет рецепт."""
-    recipe_id = int(callback_query.data.split(':')[1])
-    delete_recipe(recipe_id)
+    recipe_id, _ = _parse_recipe_callback(callback_query.data)
+
+    # Список показываем только после удаления, чтобы в нем не осталось удаленного рецепта
+    await db_call(delete_recipe, recipe_id)
 
     await callback_query.message.answer("Рецепт успешно удален!")
     await show_saved_recipes(callback_query, state)
-    await callback_query.answer()
 
 
 async def return_to_recipes_menu(callback_query: CallbackQuery, state: FSMContext):
     """Возвращает к меню рецептов."""
     await show_recipes_menu(callback_query.message, state)
-    await callback_query.answer()
+    await _answer(callback_query)
 
 
 async def start_recipe_creation(callback_query: CallbackQuery, state: FSMContext):
@@ -621,7 +686,7 @@ async def start_recipe_creation(callback_query: CallbackQuery, state: FSMContext
     )
 
     await state.set_state(RecipeStates.entering_name)
-    await callback_query.answer()
+    await _answer(callback_query)
 
 
 async def process_recipe_name(message: types.Message, state: FSMContext):
@@ -696,11 +761,8 @@ async def process_recipe_instructions(message: types.Message, state: FSMContext)
 
 async def process_recipe_calories(message: types.Message, state: FSMContext):
     """Обрабатывает ввод калорийности рецепта."""
-    try:
-        calories = float(message.text.strip().replace(',', '.'))
-        if calories <= 0:
-            raise ValueError
-    except ValueError:
+    calories = _parse_nonneg_float(message.text)
+    if calories is None or calories <= 0:
         await message.answer("Пожалуйста, введите корректное положительное число для калорий.")
         return
 
@@ -715,11 +777,8 @@ async def process_recipe_calories(message: types.Message, state: FSMContext):
 
 async def process_recipe_protein(message: types.Message, state: FSMContext):
     """Обрабатывает ввод количества белка."""
-    try:
-        protein = float(message.text.strip().replace(',', '.'))
-        if protein < 0:
-            raise ValueError
-    except ValueError:
+    protein = _parse_nonneg_float(message.text)
+    if protein is None:
         await message.answer("Пожалуйста, введите корректное неотрицательное число для белков.")
         return
 
@@ -734,11 +793,8 @@ async def process_recipe_protein(message: types.Message, state: FSMContext):
 
 async def process_recipe_fat(message: types.Message, state: FSMContext):
     """Обрабатывает ввод количества жиров."""
-    try:
-        fat = float(message.text.strip().replace(',', '.'))
-        if fat < 0:
-            raise ValueError
-    except ValueError:
+    fat = _parse_nonneg_float(message.text)
+    if fat is None:
         await message.answer("Пожалуйста, введите корректное неотрицательное число для жиров.")
         return
 
@@ -753,32 +809,16 @@ async def process_recipe_fat(message: types.Message, state: FSMContext):
 
 async def process_recipe_carbs(message: types.Message, state: FSMContext):
     """Обрабатывает ввод количества углеводов."""
-    try:
-        carbs = float(message.text.strip().replace(',', '.'))
-        if carbs < 0:
-            raise ValueError
-    except ValueError:
+    carbs = _parse_nonneg_float(message.text)
+    if carbs is None:
         await message.answer("Пожалуйста, введите корректное неотрицательное число для углеводов.")
         return
 
-    await state.update_data(carbs=carbs)
-
-    # Получаем все данные рецепта
-    recipe_data = await state.get_data()
+    # update_data возвращает все накопленные данные рецепта — отдельный get_data не нужен
+    recipe_data = await state.update_data(carbs=carbs)
 
     # Показываем итоговую информацию для подтверждения
-    confirmation_text = (
-        f"<b>Проверьте данные рецепта:</b>\n\n"
-        f"<b>Название:</b> {recipe_data['name']}\n\n"
-        f"<b>Ингредиенты:</b>\n{recipe_data['ingredients']}\n\n"
-        f"<b>Способ приготовления:</b>\n{recipe_data['instructions']}\n\n"
-        f"<b>Пищевая ценность:</b>\n"
-        f"• Калории: {recipe_data['calories']} ккал\n"
-        f"• Белки: {recipe_data['protein']} г\n"
-        f"• Жиры: {recipe_data['fat']} г\n"
-        f"• Углеводы: {recipe_data['carbs']} г\n\n"
-        f"Всё правильно?"
-    )
+    confirmation_text = _format_confirmation(recipe_data)
     await state.set_state(RecipeStates.confirming)
 
     # Создаем клавиатуру для подтверждения
@@ -800,7 +840,8 @@ async def save_recipe_handler(callback_query: CallbackQuery, state: FSMContext):
         data = await state.get_data()
 
         # Сохраняем рецепт в базу
-        recipe_id = save_recipe(
+        recipe_id = await db_call(
+            save_recipe,
             user_id=callback_query.from_user.id,
             name=data['name'],
             ingredients=data['ingredients'],
@@ -823,16 +864,7 @@ async def save_recipe_handler(callback_query: CallbackQuery, state: FSMContext):
     # Очищаем состояние и возвращаем в меню
     await state.clear()
     await show_recipes_menu(callback_query.message, state)
-    await callback_query.answer()
-
-
-async def cancel_recipe_creation(callback_query: CallbackQuery, state: FSMContext):
-    """Отменяет создание рецепта."""
-    logger.info("Cancel recipe button pressed")
-    await callback_query.message.answer("❌ Создание рецепта отменено")
-    await state.clear()
-    await show_recipes_menu(callback_query.message, state)
-    await callback_query.answer()
+    await _answer(callback_query)
 
 
 async def cancel_recipe_creation(callback_query: CallbackQuery, state: FSMContext):
@@ -842,69 +874,49 @@ async def cancel_recipe_creation(callback_query: CallbackQuery, state: FSMContex
     # Возвращаемся к меню рецептов
     await show_recipes_menu(callback_query.message, state)
     await state.clear()
-    await callback_query.answer()
+    await _answer(callback_query)
 
 
 async def generate_recipe(callback_query: CallbackQuery, state: FSMContext):
     """Генерирует рецепт на основе цели пользователя."""
     await callback_query.message.answer("🔧 Генерация рецепта в разработке!")
-    await callback_query.answer()
+    await _answer(callback_query)
 
 
+@ack_first
 async def recipe_to_diary(callback_query: CallbackQuery, state: FSMContext):
     """Добавляет рецепт в дневник питания."""
-    recipe_id = int(callback_query.data.split(':')[1])
-    recipe = get_recipe_details(recipe_id)
+    recipe_id, _ = _parse_recipe_callback(callback_query.data)
+    recipe = await db_call(get_recipe_details, recipe_id)
 
     if not recipe:
         await callback_query.message.answer("Рецепт не найден.")
-        await callback_query.answer()
         return
 
-    # Создаем клавиатуру для выбора приема пищи
-    keyboard = []
-    for meal_type in ["Завтрак", "Обед", "Ужин", "Перекус"]:
-        keyboard.append([
-            types.InlineKeyboardButton(
-                text=meal_type,
-                callback_data=f"add_recipe_to_meal:{recipe_id}:{meal_type}"
-            )
-        ])
-
-    keyboard.append([
-        types.InlineKeyboardButton(
-            text="◀️ Отмена",
-            callback_data=f"view_recipe:{recipe_id}"
-        )
-    ])
-
     await callback_query.message.answer(
         f"Выберите прием пищи для добавления рецепта '{recipe['name']}':",
-        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=keyboard)
+        reply_markup=_meal_type_keyboard(recipe_id)
     )
 
-    await callback_query.answer()
-
 
+@ack_first
 async def add_recipe_to_meal(callback_query: CallbackQuery, state: FSMContext):
     """Добавляет рецепт в конкретный прием пищи в дневнике."""
-    data = callback_query.data.split(':')
-    recipe_id = int(data[1])
-    meal_type = data[2]
+    recipe_id, meal_type = _parse_recipe_callback(callback_query.data)
 
     user_id = callback_query.from_user.id
-    recipe = get_recipe_details(recipe_id)
+    recipe = await db_call(get_recipe_details, recipe_id)
 
     if not recipe:
         await callback_query.message.answer("Рецепт не найден.")
-        await callback_query.answer()
         return
 
     # Текущая дата
-    today = datetime.now().strftime("%Y-%m-%d")
+    today = today_str()
 
     # Добавляем рецепт в дневник
-    entry_id = add_food_entry(
+    entry_id = await db_call(
+        add_food_entry,
         user_id,
         today,
         meal_type,
@@ -916,14 +928,56 @@ async def add_recipe_to_meal(callback_query: CallbackQuery, state: FSMContext):
     )
 
     if entry_id:
-        await callback_query.message.answer(
-            f"✅ Рецепт '{recipe['name']}' добавлен в {meal_type.lower()}!"
-        )
+        result_text = f"✅ Рецепт '{recipe['name']}' добавлен в {meal_type.lower()}!"
     else:
-        await callback_query.message.answer(
-            "❌ Ошибка при добавлении рецепта в дневник. Пожалуйста, попробуйте еще раз."
-        )
-
-    # Возвращаемся к деталям рецепта
-    await view_recipe_details(callback_query, state)
-    await callback_query.answer()
+        result_text = "❌ Ошибка при добавлении рецепта в дневник. Пожалуйста, попробуйте еще раз."
+
+    # Сначала результат, затем карточка рецепта (из уже загруженного рецепта)
+    await callback_query.message.answer(result_text)
+    await view_recipe_details(callback_query, state, recipe=recipe)
+
+
+# Обработчики callback_data вида "действие:число[:параметр]" по действию
+_RECIPE_CALLBACKS = {
+    "view_recipe": view_recipe_details,
+    "view_fav_recipe": view_favorite_recipe,
+    "toggle_fav": toggle_favorite_handler,
+    "toggle_favorite": toggle_recipe_favorite_status,
+    "add_to_menu": add_to_menu_handler,
+    "delete_recipe": delete_recipe_handler,
+    "recipe_to_diary": recipe_to_diary,
+    "add_recipe_to_meal": add_recipe_to_meal,
+    "search_page": handle_search_page,
+    "fav_page": handle_favorites_page,
+    "saved_page": handle_saved_recipes_page,
+}
+
+# Фильтр для регистрации handle_recipe_callback: только действия из таблицы
+RECIPE_CALLBACK_RE = re.compile(rf'^(?:{"|".join(_RECIPE_CALLBACKS)}):\d+(?::|$)')
+
+
+async def handle_recipe_callback(callback_query: CallbackQuery, state: FSMContext):
+    """Единая точка входа для кнопок рецептов: выбирает обработчик по действию из callback_data."""
+    handler = _RECIPE_CALLBACKS[callback_query.data.partition(':')[0]]
+    await handler(callback_query, state)
+
+
+# Кнопки меню рецептов вида "recipe:действие" без id
+_RECIPE_MENU_ACTIONS = {
+    "search": search_recipes,
+    "favorites": show_favorites,
+    "create": start_recipe_creation,
+    "generate": generate_recipe,
+    "save": save_recipe_handler,
+    "cancel": cancel_recipe_creation,
+    "back": return_to_main_menu,
+}
+
+# Фильтр для регистрации handle_recipe_menu_callback: полные значения callback_data из таблицы
+RECIPE_MENU_CALLBACKS = frozenset(f"recipe:{action}" for action in _RECIPE_MENU_ACTIONS)
+
+
+async def handle_recipe_menu_callback(callback_query: CallbackQuery, state: FSMContext):
+    """Единая точка входа для кнопок меню рецептов: действие берется сразу после префикса "recipe:"."""
+    handler = _RECIPE_MENU_ACTIONS[callback_query.data[len("recipe:"):]]
+    await handler(callback_query, state)
@@ -6,6 +6,7 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from config import TOKEN
 from handlers import register_handlers
 from database import close_db
+from middlewares import ThrottlingMiddleware, RequestRateLimitMiddleware
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +16,15 @@ logger = logging.getLogger(__name__)
 bot = None
 dp = None
 
+def install_event_loop_policy():
+    """Включает uvloop, если он установлен; иначе остается стандартный цикл событий asyncio."""
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("Используется цикл событий uvloop")
+
 # Функция запуска бота
 async def start_bot():
     global bot, dp
@@ -30,11 +40,17 @@ async def start_bot():
 
     try:
         bot = Bot(token=TOKEN)
+
+        # Все исходящие запросы к Telegram проходят через общий ограничитель частоты
+        bot.session.middleware(RequestRateLimitMiddleware())
         dp = Dispatcher(storage=MemoryStorage())
 
         # Регистрируем обработчики
         register_handlers(dp)
 
+        # Гасим частые повторные нажатия inline-кнопок
+        dp.callback_query.middleware(ThrottlingMiddleware())
+
         logger.info("Бот запущен!")
         await dp.start_polling(
             bot,
@@ -52,6 +68,7 @@ async def start_bot():
 
 # Если скрипт запущен напрямую
 if __name__ == "__main__":
+    install_event_loop_policy()
     try:
         asyncio.run(start_bot())
     except (KeyboardInterrupt, SystemExit):
@@ -0,0 +1,25 @@
+import os
+import shutil
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="dietplanner-tests-")
+
+
+def pytest_configure(config):
+    """Переключает базу данных на временный файл до импорта database тестами, чтобы не трогать users.db."""
+    try:
+        import config as bot_config
+    except ImportError:
+        # Без python-dotenv тесты, которым нужна база данных, пропускаются
+        return
+    bot_config.DB_PATH = os.path.join(_db_dir, "users.db")
+
+
+def pytest_unconfigure(config):
+    try:
+        import database
+    except ImportError:
+        pass
+    else:
+        database.close_db()
+    shutil.rmtree(_db_dir, ignore_errors=True)
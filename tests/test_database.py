@@ -0,0 +1,74 @@
+import itertools
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+import database
+from database import create_user, save_recipe, search_recipes_page
+
+_user_ids = itertools.count(1000)
+
+
+@pytest.fixture(params=[True, False], ids=["fts", "like"])
+def search_mode(request, monkeypatch):
+    """Прогоняет тест и через FTS5, и через запасной поиск LIKE."""
+    if request.param and not database._recipes_fts_enabled:
+        pytest.skip("SQLite собран без FTS5")
+    monkeypatch.setattr(database, "_recipes_fts_enabled", request.param)
+    return request.param
+
+
+@pytest.fixture
+def user_id():
+    user_id = next(_user_ids)
+    create_user(user_id, "Тест")
+    return user_id
+
+
+def _save(user_id, name, ingredients):
+    return save_recipe(user_id, name, ingredients, "Смешать", 300, 10, 10, 30)
+
+
+def _all_pages(user_id, query, limit):
+    pages, cursor = [], None
+    while True:
+        page = search_recipes_page(user_id, query, cursor=cursor, limit=limit)
+        if not page:
+            return pages
+        pages.append(page)
+        cursor = [page[-1]['score'], page[-1]['id']]
+
+
+def test_cursor_pages_cover_all_results_once(search_mode, user_id):
+    for i in range(7):
+        _save(user_id, f"Салат {i}", "огурец, томат")
+    _save(user_id, "Омлет", "яйцо, молоко")
+
+    pages = _all_pages(user_id, "салат", limit=3)
+    rows = [row for page in pages for row in page]
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert rows == search_recipes_page(user_id, "салат", limit=100)
+    assert len({row['id'] for row in rows}) == 7
+
+
+def test_name_matches_come_before_ingredient_matches(search_mode, user_id):
+    by_ingredient = _save(user_id, "Паста", "сыр, томат")
+    by_name = _save(user_id, "Сырники", "творог, мука")
+
+    rows = search_recipes_page(user_id, "сыр")
+
+    assert [row['id'] for row in rows] == [by_name, by_ingredient]
+
+
+def test_search_ignores_cyrillic_case(search_mode, user_id):
+    recipe_id = _save(user_id, "Борщ", "свекла, капуста")
+
+    assert [row['id'] for row in search_recipes_page(user_id, "БОРЩ")] == [recipe_id]
+
+
+def test_search_is_limited_to_user(search_mode, user_id):
+    _save(next(_user_ids), "Борщ", "свекла")
+
+    assert search_recipes_page(user_id, "борщ") == []
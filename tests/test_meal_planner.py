@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("dotenv")
+
+from meal_planner import _find_replacements
+
+
+def _index(*calories):
+    """Строит отсортированный индекс калорий так же, как _get_calorie_index; id рецепта — его позиция + 1."""
+    recipes = tuple({'id': i, 'calories': kcal} for i, kcal in enumerate(sorted(calories), start=1))
+    return tuple(r['calories'] for r in recipes), recipes
+
+
+def _ids(found):
+    return [r['id'] for r in found]
+
+
+def test_nearest_first_with_ties_resolved_to_lower_calories():
+    calories, recipes = _index(80, 100, 120, 200, 300)
+
+    # 80 и 120 отстоят от цели одинаково: первым идет менее калорийный
+    assert _ids(_find_replacements(calories, recipes, exclude_id=None, target_calories=100)) == [2, 1, 3]
+
+
+def test_range_boundaries_are_inclusive():
+    calories, recipes = _index(79, 80, 120, 121)
+
+    assert _ids(_find_replacements(calories, recipes, exclude_id=None, target_calories=100)) == [2, 3]
+
+
+def test_current_recipe_is_excluded():
+    calories, recipes = _index(90, 100, 110)
+
+    assert _ids(_find_replacements(calories, recipes, exclude_id=2, target_calories=100)) == [1, 3]
+
+
+def test_at_most_five_in_range():
+    calories, recipes = _index(*range(95, 106))
+
+    assert len(_find_replacements(calories, recipes, exclude_id=None, target_calories=100)) == 5
+
+
+def test_three_nearest_when_nothing_in_range():
+    calories, recipes = _index(10, 79, 121, 500)
+
+    assert _ids(_find_replacements(calories, recipes, exclude_id=None, target_calories=100)) == [2, 3, 1]
+
+
+def test_empty_index():
+    assert _find_replacements((), (), exclude_id=1, target_calories=100) == []
+
+    # Единственный рецепт — тот, который заменяем
+    calories, recipes = _index(100)
+    assert _find_replacements(calories, recipes, exclude_id=1, target_calories=100) == []
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from aiogram.methods import EditMessageText
+
+from middlewares import RequestRateLimitMiddleware
+
+
+def test_queued_edits_of_same_message_return_newest_message():
+    """Устаревшее редактирование не отправляется, но вызывающий код получает Message нового."""
+    sent = []
+
+    async def make_request(bot, method):
+        sent.append(method)
+        return f"message:{method.text}"
+
+    async def run():
+        # Низкая частота, чтобы второе и третье редактирование успели встать в очередь
+        middleware = RequestRateLimitMiddleware(rate=20)
+        edits = [EditMessageText(chat_id=1, message_id=10, text=text) for text in ("a", "b", "c")]
+        return edits, await asyncio.gather(*(middleware(make_request, None, edit) for edit in edits))
+
+    edits, results = asyncio.run(run())
+
+    assert sent == [edits[0], edits[2]]
+    assert results == ["message:a", "message:c", "message:c"]
+
+
+def test_edits_of_different_messages_are_not_coalesced():
+    sent = []
+
+    async def make_request(bot, method):
+        sent.append(method)
+        return method.message_id
+
+    async def run():
+        middleware = RequestRateLimitMiddleware(rate=20)
+        edits = [EditMessageText(chat_id=1, message_id=message_id, text="x") for message_id in (10, 11, 12)]
+        return await asyncio.gather(*(middleware(make_request, None, edit) for edit in edits))
+
+    assert asyncio.run(run()) == [10, 11, 12]
+    assert len(sent) == 3
+
+
+def test_superseded_edit_raises_when_newer_edit_fails():
+    """Если новое редактирование завершилось ошибкой, отброшенное получает ту же ошибку."""
+    sent = []
+
+    async def make_request(bot, method):
+        sent.append(method)
+        if method.text == "c":
+            raise RuntimeError("edit failed")
+        return f"message:{method.text}"
+
+    async def run():
+        middleware = RequestRateLimitMiddleware(rate=20)
+        edits = [EditMessageText(chat_id=1, message_id=10, text=text) for text in ("a", "b", "c")]
+        results = await asyncio.gather(
+            *(middleware(make_request, None, edit) for edit in edits), return_exceptions=True
+        )
+        return edits, results, middleware
+
+    edits, results, middleware = asyncio.run(run())
+
+    assert sent == [edits[0], edits[2]]
+    assert results[0] == "message:a"
+    assert isinstance(results[1], RuntimeError) and results[1] is results[2]
+    # После завершения не остается ни последних редактирований, ни ожидающих
+    assert middleware._latest_edits == {} and middleware._edit_waiters == {}
@@ -0,0 +1,57 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("dotenv")
+
+import recipe_generator
+from recipe_generator import RECIPE_CALLBACK_RE, handle_recipe_callback
+
+
+@pytest.mark.parametrize("data", [
+    "view_recipe:5",
+    "view_fav_recipe:5",
+    "toggle_fav:5",
+    "toggle_favorite:5",
+    "delete_recipe:12",
+    "recipe_to_diary:12",
+    "add_recipe_to_meal:12:Завтрак",
+    "search_page:0",
+    "fav_page:3",
+    "saved_page:20",
+])
+def test_recipe_callbacks_match(data):
+    assert RECIPE_CALLBACK_RE.match(data)
+
+
+@pytest.mark.parametrize("data", [
+    "view_recipe:abc",
+    "view_recipe:",
+    "view_recipes:5",
+    "toggle_fav5",
+    "add_recipe_to_meal_x:5",
+    "plan_recipe:5:Обед:2026-01-01",
+    "plan_recipes_page:20:Обед:2026-01-01",
+    "recipe:search",
+])
+def test_other_callbacks_do_not_match(data):
+    assert not RECIPE_CALLBACK_RE.match(data)
+
+
+@pytest.mark.parametrize("data, action", [
+    ("toggle_fav:5", "toggle_fav"),
+    ("toggle_favorite:5", "toggle_favorite"),
+    ("add_recipe_to_meal:12:Завтрак", "add_recipe_to_meal"),
+])
+def test_callback_is_routed_by_full_action_name(monkeypatch, data, action):
+    called = []
+    for name in recipe_generator._RECIPE_CALLBACKS:
+        async def handler(callback_query, state, name=name):
+            called.append(name)
+        monkeypatch.setitem(recipe_generator._RECIPE_CALLBACKS, name, handler)
+
+    asyncio.run(handle_recipe_callback(SimpleNamespace(data=data), None))
+
+    assert called == [action]
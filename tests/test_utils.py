@@ -0,0 +1,47 @@
+import utils
+from utils import TTLCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_entry_expires(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(utils.time, "monotonic", clock)
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("key", "value")
+
+    clock.now += 5
+    assert cache.get("key") == "value"
+
+    clock.now += 0.1
+    assert cache.get("key") is None
+    assert cache.get("key", "default") == "default"
+
+
+def test_ttl_cache_set_restarts_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(utils.time, "monotonic", clock)
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("key", 1)
+
+    clock.now += 4
+    cache.set("key", 2)
+    clock.now += 4
+    assert cache.get("key") == 2
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
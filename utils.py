@@ -1,3 +1,8 @@
+import threading
+import time
+from collections import OrderedDict
+
+
 def calculate_bmi(weight, height):
     """
     Рассчитывает Индекс Массы Тела (ИМТ).
@@ -168,4 +173,74 @@ def format_date(date_str):
         year, month, day = date_str.split('-')
         return f"{day}.{month}.{year}"
     except:
-        return date_str
\ No newline at end of file
+        return date_str
+
+
+# Текущая дата в формате YYYY-MM-DD и момент (time.time()), до которого она действительна
+_today_cache = ["", 0.0]
+
+
+def today_str():
+    """
+    Возвращает сегодняшнюю дату в формате ISO, пересчитывая строку только после полуночи.
+
+    Returns:
+        str: Дата в формате YYYY-MM-DD
+    """
+    now = time.time()
+    if now < _today_cache[1]:
+        return _today_cache[0]
+
+    local = time.localtime(now)
+    seconds_to_midnight = 86400 - (local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec)
+    value = time.strftime("%Y-%m-%d", local)
+    _today_cache[:] = [value, now + seconds_to_midnight - (now % 1)]
+    return value
+
+
+class TTLCache:
+    """
+    Небольшой потокобезопасный LRU-кэш с ограничением времени жизни записей.
+
+    Args:
+        maxsize (int): Максимальное количество записей
+        ttl (float): Время жизни записи в секундах
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Возвращает значение по ключу или default, если запись отсутствует или устарела."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Сохраняет значение, вытесняя самые старые записи при переполнении."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Удаляет запись из кэша."""
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[1]
+
+    def clear(self):
+        """Очищает кэш."""
+        with self._lock:
+            self._data.clear()
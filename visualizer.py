@@ -374,16 +374,12 @@ async def show_water_statistics(callback_query: CallbackQuery, state: FSMContext
     else:
         text += "💡 Старайтесь пить больше воды каждый день для достижения цели."
 
-    # Отправляем изображение с графиком
-    with open(image_path, 'rb') as photo:
-        await callback_query.message.answer_photo(
-            photo=types.BufferedInputFile(
-                file=photo.read(),
-                filename="water_chart.png"
-            ),
-            caption=text,
-            parse_mode="HTML"
-        )
+    # Отправляем изображение с графиком; FSInputFile читает файл асинхронно во время отправки
+    await callback_query.message.answer_photo(
+        photo=types.FSInputFile(image_path, filename="water_chart.png"),
+        caption=text,
+        parse_mode="HTML"
+    )
 
     # Удаляем временный файл
     try: